@@ -1,11 +1,23 @@
 import asyncio
+import logging
+from collections import deque
+from itertools import islice
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
-from app.agent.slugpilot_agent import SlugPilotAgent
+from app.agent.slugpilot_agent import SlugPilotAgent, TaskSnapshot
 from app.agent.study_plan_generator import StudyPlanGenerator
-from app.agent.notification_service import NotificationService
+from app.agent.notification_service import NotificationService, NotificationBatch
+from app.models.task import TaskStatus
 from app.models.user import User
 
+logger = logging.getLogger(__name__)
+
+# Upper bound for the exponential backoff after a failed cycle
+MAX_ERROR_BACKOFF_SECONDS = 60
+
+# Actions kept per agent; older ones are dropped as new ones arrive
+ACTION_HISTORY_SIZE = 1000
+
 
 class AgentLoop:
     """
@@ -19,6 +31,8 @@ class AgentLoop:
     - Sends proactive nudges
     - Auto-creates study plans
     - Makes decisions without user input
+    
+    Cycles are scheduled and run by AgentManager.
     """
     
     def __init__(self, agent: SlugPilotAgent):
@@ -27,119 +41,174 @@ class AgentLoop:
         self.last_check: Optional[datetime] = None
         self.last_plan_creation: Optional[datetime] = None
         self.last_nudge: Optional[datetime] = None
-        self.action_history: List[Dict] = []
+        self._last_state_hash: Optional[int] = None
+        # Soonest future due date among pending tasks, used to schedule the next cycle
+        self.next_deadline: Optional[datetime] = None
+        # Task id -> due date timestamp as of the previous cycle (tasks with an id only)
+        self._prev_deadlines: Dict[str, int] = {}
+        self.action_history: deque = deque(maxlen=ACTION_HISTORY_SIZE)
         self.notification_service = NotificationService(agent.user)
+        self._err_count = 0
     
-    async def start(self):
-        """Start the autonomous agent loop"""
-        self.is_running = True
-        print(f"[AgentLoop] Starting autonomous agent for user: {self.agent.user.email}")
-        
-        while self.is_running:
-            try:
-                await self._run_cycle()
-                # Run cycle every 15 minutes (configurable)
-                await asyncio.sleep(900)  # 15 minutes
-            except Exception as e:
-                print(f"[AgentLoop] Error in cycle: {e}")
-                await asyncio.sleep(60)  # Wait 1 minute on error
+    def next_error_backoff(self) -> float:
+        """Seconds to wait after a failed cycle, doubling with each consecutive failure"""
+        backoff = min(MAX_ERROR_BACKOFF_SECONDS, 2 ** min(self._err_count, 6))
+        self._err_count += 1
+        return backoff
+    
+    def reset_error_backoff(self):
+        """Reset the backoff after a successful cycle"""
+        self._err_count = 0
+    
+    def invalidate_canvas(self):
+        """Forget cached Canvas data after Canvas reports a change"""
+        self.agent.canvas_service.invalidate_deadlines()
+        self.agent.invalidate_cache()
     
     def stop(self):
         """Stop the autonomous agent loop"""
         self.is_running = False
-        print(f"[AgentLoop] Stopping agent for user: {self.agent.user.email}")
+        logger.info("Stopping agent for user: %s", self.agent.user.email)
     
     async def _run_cycle(self):
         """Execute one cycle of the agent loop"""
+        # Take the clock once per cycle and share it with every step
         cycle_start = datetime.now()
-        print(f"[AgentLoop] Running cycle at {cycle_start}")
+        logger.info("Running cycle at %s", cycle_start)
         
         actions_taken = []
+        batch = NotificationBatch(self.notification_service)
         
         # 1. Gather current state
-        all_tasks = self.agent.gather_all_tasks()
-        health = self.agent.check_academic_health()
+        all_tasks = await self.agent.gather_all_tasks()
+        health = await self.agent.check_academic_health()
+        self.next_deadline = min(
+            (t.due_date for t in all_tasks if t.status == TaskStatus.PENDING and t.due_date > cycle_start),
+            default=None
+        )
+        
+        # Diff source deadlines before any planning step can move due dates
+        deadline_shifts = self._detect_deadline_shifts(all_tasks)
+        
+        # Nothing to do if tasks and preferences are unchanged since the last
+        # cycle and neither a plan refresh nor a nudge is due
+        state_hash = self._compute_state_hash(all_tasks)
+        if (
+            state_hash == self._last_state_hash
+            and not self._should_update_plan(cycle_start)
+            and not await self.agent.should_nudge()
+        ):
+            self.last_check = cycle_start
+            logger.info("No changes since last cycle, skipping")
+            return
         
         # 2. Make autonomous decisions
-        autonomous_decisions = self.agent.make_autonomous_decisions()
+        autonomous_decisions = await self.agent.make_autonomous_decisions()
         if autonomous_decisions:
-            print(f"[AgentLoop] Made {len(autonomous_decisions)} autonomous decisions")
+            logger.info("Made %d autonomous decisions", len(autonomous_decisions))
             actions_taken.append({
                 "action": "autonomous_decisions",
                 "decisions": autonomous_decisions,
                 "count": len(autonomous_decisions),
-                "timestamp": cycle_start.isoformat()
+                "timestamp": cycle_start
             })
         
         # 3. Check if plan needs updating (daily or if deadlines changed)
-        should_update_plan = self._should_update_plan()
+        should_update_plan = self._should_update_plan(cycle_start)
         if should_update_plan:
-            print("[AgentLoop] Updating weekly plan...")
-            plan = self.agent.create_weekly_plan()
+            logger.info("Updating weekly plan...")
+            plan = await self.agent.create_weekly_plan()
             self.last_plan_creation = cycle_start
             actions_taken.append({
                 "action": "plan_updated",
                 "tasks_count": len(plan),
-                "timestamp": cycle_start.isoformat()
+                "timestamp": cycle_start
             })
         
-        # 4. Check for deadline shifts and revise plan if needed
-        deadline_shifts = self._detect_deadline_shifts(all_tasks)
+        # 4. Revise the plan if source deadlines shifted
         if deadline_shifts:
-            print(f"[AgentLoop] Detected {len(deadline_shifts)} deadline shifts, revising plan...")
-            revised_plan = self.agent.revise_plan()
+            logger.info("Detected %d deadline shifts, revising plan...", len(deadline_shifts))
+            revised_plan = await self.agent.revise_plan()
             actions_taken.append({
                 "action": "plan_revised",
                 "reason": "deadline_shifts",
                 "shifts": deadline_shifts,
-                "timestamp": cycle_start.isoformat()
+                "timestamp": cycle_start
             })
         
-        # 5. Auto-create study plans for upcoming exams
-        if self.agent.user.preferences.auto_create_study_plans:
-            study_plans_created = await self._auto_create_study_plans()
-            if study_plans_created:
-                actions_taken.append({
-                    "action": "study_plans_created",
-                    "count": len(study_plans_created),
-                    "timestamp": cycle_start.isoformat()
-                })
+        # Bucket the gathered tasks once for the steps below
+        snapshot = self.agent.build_snapshot(all_tasks)
+        
+        # 5-8. Study plans and nudges are independent of the plan-rewriting
+        # steps, so overlap their I/O; health and conflict handling both
+        # rewrite the weekly plan and run one after the other
+        auto_create = self.agent.user.preferences.auto_create_study_plans
+        study_plans_created, *step_results = await asyncio.gather(
+            self._auto_create_study_plans() if auto_create else asyncio.sleep(0, result=[]),
+            self._send_proactive_nudges(snapshot, health, batch, cycle_start),
+            self._handle_plan_issues(health, batch, cycle_start),
+            return_exceptions=True
+        )
         
-        # 6. Check academic health and take autonomous actions
-        health_actions = await self._handle_academic_health(health, all_tasks)
-        actions_taken.extend(health_actions)
+        if isinstance(study_plans_created, Exception):
+            logger.error("Error creating study plans: %s", study_plans_created)
+        elif study_plans_created:
+            actions_taken.append({
+                "action": "study_plans_created",
+                "count": len(study_plans_created),
+                "timestamp": cycle_start
+            })
         
-        # 7. Send proactive nudges if needed
-        nudge_actions = await self._send_proactive_nudges(all_tasks, health)
-        actions_taken.extend(nudge_actions)
+        for step_actions in step_results:
+            if isinstance(step_actions, Exception):
+                logger.error("Error in cycle step: %s", step_actions)
+                continue
+            actions_taken.extend(step_actions)
         
-        # 8. Handle conflicts autonomously
-        conflict_actions = await self._handle_conflicts_autonomously()
-        actions_taken.extend(conflict_actions)
+        # 9. Send everything queued this cycle as a single notification
+        await batch.flush(now=cycle_start)
         
-        # 8. Record cycle
+        # 10. Record cycle
         self.last_check = cycle_start
-        if actions_taken:
-            self.action_history.extend(actions_taken)
-            # Keep only last 100 actions
-            self.action_history = self.action_history[-100:]
+        self._last_state_hash = state_hash
+        self.action_history.extend(actions_taken)
         
-        print(f"[AgentLoop] Cycle complete. Actions taken: {len(actions_taken)}")
+        logger.info("Cycle complete. Actions taken: %d", len(actions_taken))
+    
+    def _compute_state_hash(self, tasks: List) -> int:
+        """Cheap fingerprint of the task deadlines and user preferences"""
+        return hash((
+            tuple(sorted((t.title, t.due_date) for t in tasks)),
+            self.agent.preferences.model_dump_json()
+        ))
     
-    def _should_update_plan(self) -> bool:
+    def _should_update_plan(self, now: datetime) -> bool:
         """Determine if weekly plan should be updated"""
         # Update daily, or if plan is older than 24 hours
         if self.last_plan_creation is None:
             return True
         
-        hours_since_update = (datetime.now() - self.last_plan_creation).total_seconds() / 3600
+        hours_since_update = (now - self.last_plan_creation).total_seconds() / 3600
         return hours_since_update >= 24
     
     def _detect_deadline_shifts(self, current_tasks: List) -> List[Dict]:
-        """Detect if deadlines have shifted (simplified - would compare with stored state)"""
-        # In a real implementation, would compare with stored previous state
-        # For now, return empty list (would need state persistence)
-        return []
+        """Detect deadlines that moved since the previous cycle"""
+        # Only Canvas assignments and calendar events carry a stable id. Titles
+        # repeat across courses, and mock, Slack and Piazza due dates are
+        # regenerated every fetch, so tasks without an id are never compared.
+        current = {
+            t.id: int(t.due_date.timestamp())
+            for t in current_tasks
+            if t.id is not None
+        }
+        previous = self._prev_deadlines
+        self._prev_deadlines = current
+        
+        return [
+            {"task_id": task_id, "old": previous[task_id], "new": due_ts}
+            for task_id, due_ts in current.items()
+            if task_id in previous and previous[task_id] != due_ts
+        ]
     
     async def _auto_create_study_plans(self) -> List:
         """Automatically create study plans for upcoming exams"""
@@ -147,39 +216,36 @@ class AgentLoop:
             return []
         
         try:
-            deadlines = self.agent.canvas_service.get_deadlines()
-            generator = StudyPlanGenerator(self.agent.preferences)
+            deadlines = await asyncio.to_thread(self.agent.canvas_service.get_deadlines)
+            generator = StudyPlanGenerator(self.agent.preferences, self.agent.plan_templates)
             study_plans = generator.auto_create_for_upcoming_exams(deadlines)
             
-            # Sync to calendar
-            if study_plans and self.agent.calendar_service:
-                for plan in study_plans:
-                    sessions_data = [
-                        {
-                            "course": s.course,
-                            "topic": s.topic,
-                            "duration_hours": s.duration_hours,
-                            "scheduled_time": s.scheduled_time.isoformat(),
-                            "materials": s.materials
-                        }
-                        for s in plan.sessions
-                    ]
-                    self.agent.calendar_service.sync_study_sessions(sessions_data)
+            await self.agent.sync_study_plans(study_plans)
             
             return study_plans
         except Exception as e:
-            print(f"[AgentLoop] Error creating study plans: {e}")
+            logger.error("Error creating study plans: %s", e)
             return []
     
-    async def _handle_academic_health(self, health: Dict, tasks: List) -> List[Dict]:
+    async def _handle_plan_issues(
+        self, health: Dict, batch: NotificationBatch, now: datetime
+    ) -> List[Dict]:
+        """Handle academic health, then conflicts, so their plan rewrites never overlap"""
+        actions = await self._handle_academic_health(health, batch, now)
+        actions.extend(await self._handle_conflicts_autonomously(batch, now))
+        return actions
+    
+    async def _handle_academic_health(
+        self, health: Dict, batch: NotificationBatch, now: datetime
+    ) -> List[Dict]:
         """Autonomously handle academic health issues"""
         actions = []
         
         # If health is critical, take immediate action
         if health["status"] == "critical":
             # Create emergency plan
-            print("[AgentLoop] Critical health detected - creating emergency plan")
-            emergency_plan = self.agent.create_weekly_plan()
+            logger.info("Critical health detected - creating emergency plan")
+            emergency_plan = await self.agent.create_weekly_plan()
             
             # Send urgent notification
             message = (
@@ -187,12 +253,12 @@ class AgentLoop:
                 f"I've created an emergency plan with {len(emergency_plan)} prioritized tasks. "
                 f"Focus on overdue items first!"
             )
-            self.notification_service.send_nudge(message, priority="critical")
+            batch.add(message, priority="critical")
             
             actions.append({
                 "action": "emergency_plan_created",
                 "health_score": health["score"],
-                "timestamp": datetime.now().isoformat()
+                "timestamp": now
             })
         
         # If at risk, send warning and suggest adjustments
@@ -203,45 +269,46 @@ class AgentLoop:
                     f"Let's prioritize getting caught up. "
                     f"I've updated your plan to focus on these first."
                 )
-                self.notification_service.send_nudge(message, priority="high")
+                batch.add(message, priority="high")
                 
                 actions.append({
                     "action": "overdue_warning_sent",
                     "overdue_count": health["overdue_count"],
-                    "timestamp": datetime.now().isoformat()
+                    "timestamp": now
                 })
         
         return actions
     
-    async def _send_proactive_nudges(self, tasks: List, health: Dict) -> List[Dict]:
+    async def _send_proactive_nudges(
+        self, snapshot: TaskSnapshot, health: Dict, batch: NotificationBatch, now: datetime
+    ) -> List[Dict]:
         """Send proactive nudges based on agent's decision"""
         actions = []
         
         # Check if nudge is needed
-        if not self.agent.should_nudge():
+        if not await self.agent.should_nudge():
             return actions
         
         # Don't nudge too frequently (at most once per 6 hours)
         if self.last_nudge:
-            hours_since_nudge = (datetime.now() - self.last_nudge).total_seconds() / 3600
+            hours_since_nudge = (now - self.last_nudge).total_seconds() / 3600
             if hours_since_nudge < 6:
                 return actions
         
-        # Generate and send nudge
-        message = self.notification_service.generate_nudge_message(tasks, health)
-        success = self.notification_service.send_nudge(message, priority=health["status"])
+        # Generate nudge (sent with the rest of the cycle's notifications)
+        message = self.notification_service.generate_nudge_message(snapshot, health)
+        batch.add(message, priority=health["status"])
         
-        if success:
-            self.last_nudge = datetime.now()
-            actions.append({
-                "action": "nudge_sent",
-                "message": message,
-                "timestamp": datetime.now().isoformat()
-            })
+        self.last_nudge = now
+        actions.append({
+            "action": "nudge_sent",
+            "message": message,
+            "timestamp": now
+        })
         
         return actions
     
-    async def _handle_conflicts_autonomously(self) -> List[Dict]:
+    async def _handle_conflicts_autonomously(self, batch: NotificationBatch, now: datetime) -> List[Dict]:
         """Autonomously resolve conflicts when possible"""
         actions = []
         
@@ -255,27 +322,30 @@ class AgentLoop:
         for conflict in self.agent.conflicts:
             if conflict["type"] == "time_conflict":
                 # Agent autonomously redistributes tasks
-                print(f"[AgentLoop] Resolving time conflict on {conflict['date']}")
-                revised_plan = self.agent.revise_plan()
+                logger.info("Resolving time conflict on %s", conflict["date"])
+                revised_plan = await self.agent.revise_plan()
                 
                 message = (
                     f"I detected a scheduling conflict on {conflict['date']} "
                     f"({conflict['total_hours']:.1f} hours). "
                     f"I've redistributed your tasks to balance the workload."
                 )
-                self.notification_service.send_nudge(message, priority="medium")
+                batch.add(message, priority="medium")
                 
                 actions.append({
                     "action": "conflict_resolved",
                     "conflict_type": "time_conflict",
-                    "timestamp": datetime.now().isoformat()
+                    "timestamp": now
                 })
         
         return actions
     
-    def get_action_history(self, limit: int = 20) -> List[Dict]:
-        """Get recent action history"""
-        return self.action_history[-limit:]
+    def get_action_history(self, limit: int = 20, offset: int = 0) -> List[Dict]:
+        """Get recent action history, oldest first, skipping the newest `offset` actions"""
+        # Walk from the newest end so the cost is O(offset + limit), not O(history)
+        page = list(islice(reversed(self.action_history), offset, offset + limit))
+        page.reverse()
+        return page
     
     def get_status(self) -> Dict:
         """Get current agent status"""
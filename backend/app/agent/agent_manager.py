@@ -1,20 +1,47 @@
-from typing import Dict, Optional
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
 from app.agent.agent_loop import AgentLoop
 from app.agent.slugpilot_agent import SlugPilotAgent
 from app.models.user import User
 import asyncio
+import heapq
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Seconds between agent cycles
+CYCLE_INTERVAL_SECONDS = 900
+
+# Cycles are pulled forward to just after an agent's next deadline, but never
+# closer together than this
+MIN_CYCLE_INTERVAL_SECONDS = 60
+
+# Upper bound on cycles run at once by run_cycles
+BATCH_CYCLE_CONCURRENCY = 16
 
 
 class AgentManager:
     """
     Manages multiple agent instances running autonomously.
     This is the orchestrator for all autonomous agents.
+    
+    Instead of one long-lived sleeping task per agent, a single supervisor
+    task keeps a min-heap of (next_run_time, user_id) and only dispatches
+    cycles for agents that are due.
     """
     
     def __init__(self):
         self.agents: Dict[str, SlugPilotAgent] = {}
         self.agent_loops: Dict[str, AgentLoop] = {}
-        self.running_tasks: Dict[str, asyncio.Task] = {}
+        # Heap of (next_run_time, user_id); entries not matching _next_run are stale
+        self._schedule: List[Tuple[float, str]] = []
+        self._next_run: Dict[str, float] = {}
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        # Agents poked mid-cycle; they run again as soon as that cycle ends
+        self._pending_pokes: Set[str] = set()
+        self._supervisor: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
     
     def register_agent(self, user: User) -> str:
         """Register a new user's agent"""
@@ -24,7 +51,7 @@ class AgentManager:
         self.agents[user.id] = agent
         self.agent_loops[user.id] = agent_loop
         
-        print(f"[AgentManager] Registered agent for user: {user.email}")
+        logger.info("Registered agent for user: %s", user.email)
         return user.id
     
     async def start_agent(self, user_id: str):
@@ -32,15 +59,15 @@ class AgentManager:
         if user_id not in self.agent_loops:
             raise ValueError(f"Agent not registered for user: {user_id}")
         
-        if user_id in self.running_tasks:
-            print(f"[AgentManager] Agent already running for user: {user_id}")
+        if self.is_agent_running(user_id):
+            logger.info("Agent already running for user: %s", user_id)
             return
         
-        loop = self.agent_loops[user_id]
-        task = asyncio.create_task(loop.start())
-        self.running_tasks[user_id] = task
+        self.agent_loops[user_id].is_running = True
+        self._ensure_supervisor()
+        self._schedule_agent(user_id, time.monotonic())
         
-        print(f"[AgentManager] Started autonomous agent for user: {user_id}")
+        logger.info("Started autonomous agent for user: %s", user_id)
     
     async def stop_agent(self, user_id: str):
         """Stop the autonomous loop for a user's agent"""
@@ -50,16 +77,157 @@ class AgentManager:
         loop = self.agent_loops[user_id]
         loop.stop()
         
-        if user_id in self.running_tasks:
-            task = self.running_tasks[user_id]
+        # The heap entry is left in place and skipped by the supervisor
+        self._next_run.pop(user_id, None)
+        self._pending_pokes.discard(user_id)
+        self._compact_schedule()
+        
+        if user_id in self._in_flight:
+            task = self._in_flight[user_id]
             task.cancel()
             try:
                 await task
             except asyncio.CancelledError:
                 pass
-            del self.running_tasks[user_id]
+            self._in_flight.pop(user_id, None)
+        
+        logger.info("Stopped agent for user: %s", user_id)
+    
+    def poke_agent(self, user_id: str):
+        """Run a running agent's next cycle as soon as possible"""
+        if user_id in self._in_flight:
+            # The current cycle may already hold stale data; go again once it ends
+            self._pending_pokes.add(user_id)
+        elif user_id in self._next_run:
+            self._schedule_agent(user_id, time.monotonic())
+    
+    def _release(self, user_id: str) -> bool:
+        """Mark an agent's cycle finished; True if it was poked meanwhile"""
+        self._in_flight.pop(user_id, None)
+        poked = user_id in self._pending_pokes
+        self._pending_pokes.discard(user_id)
+        return poked
+    
+    def _ensure_supervisor(self):
+        """Start the supervisor task on the running event loop if needed"""
+        if self._wake is None:
+            self._wake = asyncio.Event()
+        if self._supervisor is None or self._supervisor.done():
+            self._supervisor = asyncio.create_task(self._supervise())
+    
+    def _schedule_agent(self, user_id: str, run_at: float):
+        """Schedule an agent's next cycle and wake the supervisor"""
+        self._next_run[user_id] = run_at
+        heapq.heappush(self._schedule, (run_at, user_id))
+        if self._wake is not None:
+            self._wake.set()
+    
+    def _compact_schedule(self):
+        """Drop stale heap entries once they make up more than half the heap"""
+        if len(self._schedule) > 2 * len(self._next_run):
+            self._schedule = [
+                (run_at, user_id) for run_at, user_id in self._schedule
+                if self._next_run.get(user_id) == run_at
+            ]
+            heapq.heapify(self._schedule)
+    
+    async def _supervise(self):
+        """Dispatch agent cycles as they come due"""
+        while True:
+            now = time.monotonic()
+            while self._schedule and self._schedule[0][0] <= now:
+                run_at, user_id = heapq.heappop(self._schedule)
+                if self._next_run.get(user_id) != run_at:
+                    continue  # Agent stopped or rescheduled
+                del self._next_run[user_id]
+                if user_id in self._in_flight:
+                    # A batch cycle from run_cycles holds the agent; try again later
+                    self._schedule_agent(user_id, now + MIN_CYCLE_INTERVAL_SECONDS)
+                    continue
+                self._in_flight[user_id] = asyncio.create_task(self._run_agent_cycle(user_id))
+            
+            timeout = self._schedule[0][0] - now if self._schedule else None
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+    
+    async def _run_agent_cycle(self, user_id: str):
+        """Run one cycle for an agent and schedule its next one"""
+        loop = self.agent_loops[user_id]
+        delay = CYCLE_INTERVAL_SECONDS
+        try:
+            await loop._run_cycle()
+            loop.reset_error_backoff()
+            delay = self._next_cycle_delay(loop)
+        except Exception as e:
+            logger.error("Error in cycle for user %s: %s", user_id, e)
+            delay = loop.next_error_backoff()
+        finally:
+            if self._release(user_id):
+                delay = 0
+        
+        if loop.is_running:
+            self._schedule_agent(user_id, time.monotonic() + delay)
+    
+    async def run_cycle(self, user_id: str) -> bool:
+        """
+        Run one cycle for an agent right now, outside its schedule. Returns
+        False without running if a cycle for the agent is already in flight.
+        """
+        if user_id in self._in_flight:
+            return False
+        # Claim the agent so the supervisor and poke_agent leave it alone meanwhile
+        self._in_flight[user_id] = asyncio.current_task()
+        try:
+            await self.agent_loops[user_id]._run_cycle()
+        finally:
+            if self._release(user_id) and user_id in self._next_run:
+                self._schedule_agent(user_id, time.monotonic())
+        return True
+    
+    async def run_cycles(self, user_ids: Optional[List[str]] = None) -> Dict[str, str]:
+        """
+        Run one cycle for many agents at once (e.g. from a cron job).
         
-        print(f"[AgentManager] Stopped agent for user: {user_id}")
+        Cycles are I/O-bound and agents share nothing, so they run
+        concurrently on the event loop, bounded by BATCH_CYCLE_CONCURRENCY.
+        Agents whose scheduled cycle is already in flight are skipped.
+        """
+        if user_ids is None:
+            user_ids = list(self.agent_loops)
+        slots = asyncio.Semaphore(BATCH_CYCLE_CONCURRENCY)
+        
+        async def run_one(user_id: str) -> str:
+            if user_id not in self.agent_loops:
+                return "not_registered"
+            if user_id in self._in_flight:
+                return "skipped"
+            async with slots:
+                try:
+                    # Re-checks _in_flight, since another cycle may start while we wait for a slot
+                    ran = await self.run_cycle(user_id)
+                except asyncio.CancelledError:
+                    return "cancelled"  # stop_agent cancelled the claimed cycle
+                except Exception as e:
+                    logger.error("Error in batch cycle for user %s: %s", user_id, e)
+                    return "error"
+            return "completed" if ran else "skipped"
+        
+        results = await asyncio.gather(*(run_one(user_id) for user_id in user_ids))
+        return dict(zip(user_ids, results))
+    
+    def _next_cycle_delay(self, loop: AgentLoop) -> float:
+        """
+        Seconds until an agent's next cycle: the regular interval, or just
+        after its next deadline passes if that comes sooner, so the agent
+        reacts as soon as a task goes overdue.
+        """
+        if loop.next_deadline is None:
+            return CYCLE_INTERVAL_SECONDS
+        until_deadline = (loop.next_deadline - datetime.now()).total_seconds() + 1
+        return min(CYCLE_INTERVAL_SECONDS, max(MIN_CYCLE_INTERVAL_SECONDS, until_deadline))
     
     def get_agent(self, user_id: str) -> Optional[SlugPilotAgent]:
         """Get agent instance for a user"""
@@ -76,12 +244,20 @@ class AgentManager:
     
     async def stop_all_agents(self):
         """Stop all running agents"""
-        for user_id in list(self.running_tasks.keys()):
+        for user_id in set(self._next_run) | set(self._in_flight):
             await self.stop_agent(user_id)
+        
+        if self._supervisor is not None:
+            self._supervisor.cancel()
+            try:
+                await self._supervisor
+            except asyncio.CancelledError:
+                pass
+            self._supervisor = None
     
     def is_agent_running(self, user_id: str) -> bool:
         """Check if agent is running for a user"""
-        return user_id in self.running_tasks
+        return user_id in self._next_run or user_id in self._in_flight
 
 
 # Global agent manager instance
@@ -1,23 +1,48 @@
-from datetime import datetime
-from typing import List, Dict
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import List, Dict, Optional, Tuple
 from app.models.task import Task
 from app.models.user import User
+from app.agent.slugpilot_agent import TaskSnapshot
 from app.services.slack_service import SlackService
 from app.services.calendar_service import CalendarService
 
+logger = logging.getLogger(__name__)
+
 
 class NotificationService:
     """Service for sending nudges and notifications to users"""
     
+    # Authenticated clients shared by every NotificationService, keyed by credentials,
+    # so repeated instances reuse existing connections instead of building new clients
+    _slack_pool: Dict[str, SlackService] = {}
+    _calendar_pool: Dict[Tuple[str, bool], CalendarService] = {}
+    
     def __init__(self, user: User):
         self.user = user
-        self.slack_service = SlackService(user.slack_bot_token) if user.slack_bot_token else None
-        self.calendar_service = CalendarService(
+        self.slack_service = self._get_slack_service(user.slack_bot_token) if user.slack_bot_token else None
+        self.calendar_service = self._get_calendar_service(
             user.google_calendar_token,
             user.apple_calendar_enabled
         ) if user.google_calendar_token else None
     
-    def send_nudge(self, message: str, priority: str = "medium") -> bool:
+    @classmethod
+    def _get_slack_service(cls, bot_token: str) -> SlackService:
+        """Get the shared Slack client for a bot token"""
+        if bot_token not in cls._slack_pool:
+            cls._slack_pool[bot_token] = SlackService(bot_token)
+        return cls._slack_pool[bot_token]
+    
+    @classmethod
+    def _get_calendar_service(cls, google_token: str, apple_calendar_enabled: bool) -> CalendarService:
+        """Get the shared calendar client for a set of calendar credentials"""
+        key = (google_token, apple_calendar_enabled)
+        if key not in cls._calendar_pool:
+            cls._calendar_pool[key] = CalendarService(google_token, apple_calendar_enabled)
+        return cls._calendar_pool[key]
+    
+    async def send_nudge(self, message: str, priority: str = "medium", now: Optional[datetime] = None) -> bool:
         """Send a nudge notification to the user"""
         # In a real implementation, this would:
         # - Send email
@@ -27,34 +52,43 @@ class NotificationService:
         
         success = True
         
-        # Slack notification
+        # Slack and calendar clients are blocking, so run them off the event loop concurrently
+        await asyncio.gather(
+            self._send_slack(message),
+            self._create_calendar_reminder(message, now or datetime.now()),
+            return_exceptions=True
+        )
+        
+        # Log notification (in real app, would send via email/push/etc)
+        logger.info("%s: %s", priority.upper(), message)
+        
+        return success
+    
+    async def _send_slack(self, message: str):
+        """Post the nudge to Slack"""
         if self.slack_service and self.user.slack_channel_ids:
             # Send to first configured channel (or DM channel if available)
             channel_id = self.user.slack_channel_ids[0]
-            self.slack_service.send_notification(channel_id, message)
-        
-        # Calendar reminder
+            await asyncio.to_thread(self.slack_service.send_notification, channel_id, message)
+    
+    async def _create_calendar_reminder(self, message: str, reminder_time: datetime):
+        """Create a calendar reminder event for the nudge"""
         if self.calendar_service:
-            # Create a reminder event
-            reminder_time = datetime.now()
-            end_time = reminder_time.replace(minute=reminder_time.minute + 5)
+            end_time = reminder_time + timedelta(minutes=5)
             
-            self.calendar_service.create_event(
+            await asyncio.to_thread(
+                self.calendar_service.create_event,
                 title=f"SlugPilot: {message[:50]}",
                 start_time=reminder_time,
                 end_time=end_time,
                 description=message
             )
-        
-        # Log notification (in real app, would send via email/push/etc)
-        print(f"[NOTIFICATION] {priority.upper()}: {message}")
-        
-        return success
     
-    def generate_nudge_message(self, tasks: List[Task], health_status: Dict) -> str:
+    def generate_nudge_message(self, snapshot: TaskSnapshot, health_status: Dict) -> str:
         """Generate a personalized nudge message"""
-        overdue = [t for t in tasks if t.status.value == "overdue"]
-        critical = [t for t in tasks if t.priority.value == "critical"]
+        overdue = snapshot.overdue
+        critical = snapshot.critical
+        upcoming = snapshot.pending
         
         if overdue:
             return (
@@ -76,7 +110,6 @@ class NotificationService:
             )
         
         # Positive nudge
-        upcoming = [t for t in tasks if t.status.value == "pending"][:3]
         if upcoming:
             return (
                 f"✅ You're on track! Upcoming: {upcoming[0].title} "
@@ -85,9 +118,9 @@ class NotificationService:
         
         return "Keep up the great work! 🎓"
     
-    def send_weekly_summary(self, weekly_plan: List[Task], health: Dict) -> bool:
+    async def send_weekly_summary(self, weekly_plan: List[Task], health: Dict) -> bool:
         """Send a weekly summary to the user"""
-        message = f"""
+        header = f"""
 📅 Weekly Summary - {datetime.now().strftime('%B %d, %Y')}
 
 Academic Health: {health['status'].upper()} ({health['score']}/100)
@@ -97,11 +130,47 @@ Academic Health: {health['status'].upper()} ({health['score']}/100)
 
 This Week's Plan:
 """
-        for i, task in enumerate(weekly_plan[:10], 1):  # Top 10 tasks
-            message += f"{i}. {task.title} - Due {task.due_date.strftime('%m/%d')} ({task.priority.value})\n"
+        lines = [
+            f"{i}. {task.title} - Due {task.due_date:%m/%d} ({task.priority.value})\n"
+            for i, task in enumerate(weekly_plan[:10], 1)  # Top 10 tasks
+        ]
         
         if len(weekly_plan) > 10:
-            message += f"... and {len(weekly_plan) - 10} more tasks\n"
+            lines.append(f"... and {len(weekly_plan) - 10} more tasks\n")
         
-        return self.send_nudge(message, priority="low")
+        message = header + "".join(lines)
+        
+        return await self.send_nudge(message, priority="low")
+
 
+class NotificationBatch:
+    """Queues nudges during an agent cycle and sends them as a single notification"""
+    
+    # Lower rank = more urgent; covers both nudge priorities and health statuses
+    PRIORITY_RANK = {
+        "critical": 0,
+        "high": 1,
+        "at_risk": 1,
+        "medium": 2,
+        "low": 3,
+        "healthy": 3,
+    }
+    
+    def __init__(self, notification_service: NotificationService):
+        self.notification_service = notification_service
+        self.items: List[Tuple[str, str]] = []
+    
+    def add(self, message: str, priority: str = "medium"):
+        """Queue a message to be sent on the next flush"""
+        self.items.append((message, priority))
+    
+    async def flush(self, now: Optional[datetime] = None) -> bool:
+        """Send all queued messages as one nudge, most urgent first"""
+        if not self.items:
+            return True
+        
+        items = sorted(self.items, key=lambda item: self.PRIORITY_RANK.get(item[1], 2))
+        self.items = []
+        
+        message = "\n\n".join(message for message, _ in items)
+        return await self.notification_service.send_nudge(message, priority=items[0][1], now=now)
@@ -1,13 +1,75 @@
-from datetime import datetime, timedelta
-from typing import List, Optional, Dict
+import asyncio
+import heapq
+import logging
+from itertools import chain
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 from app.models.task import Task, TaskPriority, TaskStatus
 from app.models.deadline import Deadline
 from app.models.study_plan import StudyPlan, StudySession
 from app.models.user import User, UserPreferences
+from app.agent.study_plan_generator import PlanTemplateCache
 from app.services.canvas_service import CanvasService
 from app.services.calendar_service import CalendarService
 from app.services.piazza_service import PiazzaService
 from app.services.slack_service import SlackService
+from app.services.mock_data_service import mock_data_service
+from app.utils.cache import ttl_cache
+from app.utils.dates import SECONDS_PER_DAY, epoch_seconds
+
+logger = logging.getLogger(__name__)
+
+# How long gathered tasks and health checks are reused before re-fetching sources
+CACHE_TTL_SECONDS = 60
+
+# Blocking service clients run here, shared by every agent so a burst of
+# cycles can't starve the default executor used by the rest of the app
+SOURCE_FETCH_WORKERS = 8
+_SOURCE_EXECUTOR = ThreadPoolExecutor(max_workers=SOURCE_FETCH_WORKERS, thread_name_prefix="task-source")
+
+# A source slower than this falls back to mock data so one slow API can't
+# hold up the whole gather
+SOURCE_FETCH_TIMEOUT_SECONDS = 10
+
+# Max study plans synced to Google Calendar at once (stays under API rate limits)
+CALENDAR_SYNC_CONCURRENCY = 5
+
+# Planning order: lower rank is scheduled first
+_PRIORITY_RANK = {
+    TaskPriority.CRITICAL: 0,
+    TaskPriority.HIGH: 1,
+    TaskPriority.MEDIUM: 2,
+    TaskPriority.LOW: 3
+}
+
+
+def _copy_tasks(tasks: List[Task]) -> List[Task]:
+    """Shallow copies, so in-place planning edits don't reach the cached originals"""
+    return [task.model_copy() for task in tasks]
+
+
+@dataclass
+class TaskSnapshot:
+    """Tasks bucketed in a single pass, shared by the steps of an agent cycle"""
+    tasks: List[Task]
+    overdue: List[Task] = field(default_factory=list)
+    critical: List[Task] = field(default_factory=list)
+    pending: List[Task] = field(default_factory=list)
+    
+    @classmethod
+    def from_tasks(cls, tasks: List[Task]) -> "TaskSnapshot":
+        snapshot = cls(tasks=tasks)
+        for task in tasks:
+            if task.status == TaskStatus.OVERDUE:
+                snapshot.overdue.append(task)
+            elif task.status == TaskStatus.PENDING:
+                snapshot.pending.append(task)
+            if task.priority == TaskPriority.CRITICAL:
+                snapshot.critical.append(task)
+        return snapshot
 
 
 class SlugPilotAgent:
@@ -41,101 +103,163 @@ class SlugPilotAgent:
         self.weekly_plan: List[Task] = []
         self.last_plan_update: Optional[datetime] = None
         self.conflicts: List[Dict] = []
+        # Study plan layouts reused by this user's StudyPlanGenerators
+        self.plan_templates = PlanTemplateCache()
     
-    def gather_all_tasks(self) -> List[Task]:
-        """Aggregate tasks from all sources"""
-        all_tasks = []
-        from app.services.mock_data_service import mock_data_service
-        
-        # Canvas deadlines (always works - uses mock data if no token)
-        try:
-            canvas_tasks = self.canvas_service.get_tasks_from_deadlines()
-            all_tasks.extend(canvas_tasks)
-        except Exception as e:
-            print(f"Error getting Canvas tasks: {e}")
-            # Fallback: use mock data directly
-            deadlines = mock_data_service.generate_canvas_deadlines(10)
-            canvas_tasks = self.canvas_service.get_tasks_from_deadlines(deadlines)
-            all_tasks.extend(canvas_tasks)
-        
-        # Calendar events (use mock if no real calendar)
-        if self.calendar_service and self.user.google_calendar_token:
-            try:
-                calendar_tasks = self.calendar_service.get_tasks_from_calendar()
-                all_tasks.extend(calendar_tasks)
-            except:
-                all_tasks.extend(mock_data_service.generate_calendar_events(5))
-        else:
-            all_tasks.extend(mock_data_service.generate_calendar_events(5))
-        
-        # Piazza announcements (use mock if no real Piazza)
-        if self.piazza_service and self.user.piazza_credentials:
-            try:
-                piazza_tasks = self.piazza_service.get_tasks_from_announcements()
-                all_tasks.extend(piazza_tasks)
-            except:
-                all_tasks.extend(mock_data_service.generate_piazza_announcements())
-        else:
-            all_tasks.extend(mock_data_service.generate_piazza_announcements())
-        
-        # Slack messages (use mock if no real Slack)
-        if self.slack_service and self.user.slack_bot_token and self.user.slack_channel_ids:
+    async def gather_all_tasks(self) -> List[Task]:
+        """
+        Aggregate tasks from all sources, fetching them concurrently.
+        
+        The source results are cached for CACHE_TTL_SECONDS, but every call
+        gets its own copies: planning and decisions update task priority,
+        status and due date in place, and those edits must not leak into
+        later reads.
+        """
+        return _copy_tasks(await self._gather_source_tasks())
+    
+    @ttl_cache(CACHE_TTL_SECONDS)
+    async def _gather_source_tasks(self) -> List[Task]:
+        """Fetch, dedupe and sort tasks from every source (shared, treat as read-only)"""
+        # One timestamp for every source, so priorities are computed against the same "now"
+        now = datetime.now()
+        results = await asyncio.gather(
+            *(self._fetch_source(*source) for source in self._task_sources(now)),
+            return_exceptions=True
+        )
+        
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error("Error gathering tasks: %s", result)
+        
+        # Remove duplicates while streaming over the per-source lists, then sort
+        # by due date. Keys are built once and the sort compares them directly
+        # instead of calling a lambda per element.
+        unique_tasks = self._deduplicate_tasks(chain.from_iterable(
+            result for result in results if not isinstance(result, Exception)
+        ))
+        keys = [(t.due_date, t.priority.value) for t in unique_tasks]
+        order = sorted(range(len(unique_tasks)), key=keys.__getitem__)
+        return [unique_tasks[i] for i in order]
+    
+    def _task_sources(
+        self, now: datetime
+    ) -> List[Tuple[str, Callable[[], List[Task]], Callable[[], List[Task]], bool]]:
+        """(name, real fetcher, mock fetcher, enabled) for every task source"""
+        user = self.user
+        return [
+            # Canvas always works - CanvasService uses mock data if no token
+            (
+                "Canvas",
+                lambda: self.canvas_service.get_tasks_from_deadlines(now=now),
+                lambda: self.canvas_service.get_tasks_from_deadlines(
+                    mock_data_service.generate_canvas_deadlines(10, now), now
+                ),
+                True
+            ),
+            (
+                "Calendar",
+                lambda: self.calendar_service.get_tasks_from_calendar(now),
+                lambda: mock_data_service.generate_calendar_events(5, now),
+                bool(self.calendar_service and user.google_calendar_token)
+            ),
+            (
+                "Piazza",
+                lambda: self.piazza_service.get_tasks_from_announcements(now),
+                lambda: mock_data_service.generate_piazza_announcements(now),
+                bool(self.piazza_service and user.piazza_credentials)
+            ),
+            (
+                "Slack",
+                lambda: self.slack_service.get_tasks_from_messages(user.slack_channel_ids, now),
+                lambda: mock_data_service.generate_slack_messages(now),
+                bool(self.slack_service and user.slack_bot_token and user.slack_channel_ids)
+            ),
+        ]
+    
+    async def _fetch_source(
+        self,
+        name: str,
+        fetch: Callable[[], List[Task]],
+        mock: Callable[[], List[Task]],
+        enabled: bool
+    ) -> List[Task]:
+        """Fetch one source on the shared source executor (the clients are blocking), falling back to mock data"""
+        if enabled:
             try:
-                slack_tasks = self.slack_service.get_tasks_from_messages(self.user.slack_channel_ids)
-                all_tasks.extend(slack_tasks)
-            except:
-                all_tasks.extend(mock_data_service.generate_slack_messages())
-        else:
-            all_tasks.extend(mock_data_service.generate_slack_messages())
-        
-        # Remove duplicates and sort by due date
-        unique_tasks = self._deduplicate_tasks(all_tasks)
-        return sorted(unique_tasks, key=lambda t: (t.due_date, t.priority.value))
+                return await asyncio.wait_for(
+                    asyncio.get_running_loop().run_in_executor(_SOURCE_EXECUTOR, fetch),
+                    timeout=SOURCE_FETCH_TIMEOUT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                logger.warning("Timed out getting %s tasks after %ss", name, SOURCE_FETCH_TIMEOUT_SECONDS)
+            except Exception as e:
+                logger.exception("Error getting %s tasks: %s", name, e)
+        return mock()
+    
+    def build_snapshot(self, tasks: List[Task]) -> TaskSnapshot:
+        """Bucket tasks by status and priority once for reuse across a cycle"""
+        return TaskSnapshot.from_tasks(tasks)
+    
+    def invalidate_cache(self):
+        """Drop cached tasks and health so the next call re-fetches all sources"""
+        SlugPilotAgent._gather_source_tasks.cache_clear(self)
+        self._invalidate_health()
     
-    def _deduplicate_tasks(self, tasks: List[Task]) -> List[Task]:
+    def _invalidate_health(self):
+        """Drop the cached health check after the cached tasks were mutated"""
+        SlugPilotAgent.check_academic_health.cache_clear(self)
+    
+    def _deduplicate_tasks(self, tasks: Iterable[Task]) -> List[Task]:
         """Remove duplicate tasks based on title and due date"""
         seen = set()
         unique = []
         
         for task in tasks:
-            key = (task.title.lower(), task.due_date.date())
+            key = task.dedupe_key()
             if key not in seen:
                 seen.add(key)
                 unique.append(task)
         
         return unique
     
-    def create_weekly_plan(self) -> List[Task]:
+    async def create_weekly_plan(self) -> List[Task]:
         """
         Create a weekly plan prioritizing tasks.
         This is the core planning function.
         """
-        all_tasks = self.gather_all_tasks()
+        return self._create_weekly_plan_from(await self.gather_all_tasks())
+    
+    def _create_weekly_plan_from(self, all_tasks: List[Task], now: Optional[datetime] = None) -> List[Task]:
+        """Build the weekly plan from an already gathered task list"""
+        now = now or datetime.now()
         
-        # Filter to upcoming week
-        week_end = datetime.now() + timedelta(days=7)
-        upcoming_tasks = [t for t in all_tasks if t.due_date <= week_end]
+        # Prioritize tasks in the upcoming week; the filter streams into the
+        # prioritizer so no intermediate list is built
+        week_end = now + timedelta(days=7)
+        prioritized = self._prioritize_tasks((t for t in all_tasks if t.due_date <= week_end), now)
         
-        # Prioritize tasks
-        prioritized = self._prioritize_tasks(upcoming_tasks)
+        # Derive each task's day once; conflicts and distribution both group by it
+        day_of = {id(t): t.due_date.date() for t in prioritized}
         
         # Check for conflicts
-        self.conflicts = self._detect_conflicts(prioritized)
+        self.conflicts = self._detect_conflicts(prioritized, day_of)
         
         # Distribute tasks across the week
-        weekly_plan = self._distribute_tasks(prioritized)
+        weekly_plan = self._distribute_tasks(prioritized, day_of, now)
         
         self.weekly_plan = weekly_plan
-        self.last_plan_update = datetime.now()
+        self.last_plan_update = now
         
         return weekly_plan
     
-    def _prioritize_tasks(self, tasks: List[Task]) -> List[Task]:
+    def _prioritize_tasks(self, tasks: Iterable[Task], now: Optional[datetime] = None) -> List[Task]:
         """Prioritize tasks based on urgency, importance, and user preferences"""
-        now = datetime.now()
+        now_ts = epoch_seconds(now or datetime.now())
+        heap = []
         
-        for task in tasks:
-            days_until_due = (task.due_date - now).days
+        for i, task in enumerate(tasks):
+            due_ts = task.due_timestamp()
+            days_until_due = int((due_ts - now_ts) // SECONDS_PER_DAY)
             
             # Update priority based on time remaining
             if days_until_due <= 1:
@@ -147,33 +271,26 @@ class SlugPilotAgent:
                     task.priority = TaskPriority.HIGH
             
             # Check if overdue
-            if task.due_date < now and task.status != TaskStatus.COMPLETED:
+            if due_ts < now_ts and task.status != TaskStatus.COMPLETED:
                 task.status = TaskStatus.OVERDUE
                 task.priority = TaskPriority.CRITICAL
+            
+            # Order by priority and due date; the index keeps ties stable
+            heap.append((_PRIORITY_RANK[task.priority], task.due_date, i, task))
         
-        # Sort by priority and due date
-        priority_order = {
-            TaskPriority.CRITICAL: 0,
-            TaskPriority.HIGH: 1,
-            TaskPriority.MEDIUM: 2,
-            TaskPriority.LOW: 3
-        }
-        
-        return sorted(tasks, key=lambda t: (
-            priority_order[t.priority],
-            t.due_date
-        ))
+        heapq.heapify(heap)
+        return [heapq.heappop(heap)[-1] for _ in range(len(heap))]
     
-    def _detect_conflicts(self, tasks: List[Task]) -> List[Dict]:
+    def _detect_conflicts(self, tasks: List[Task], day_of: Optional[Dict[int, date]] = None) -> List[Dict]:
         """Detect scheduling conflicts and priority conflicts"""
         conflicts = []
+        if day_of is None:
+            day_of = {id(t): t.due_date.date() for t in tasks}
         
         # Check for time conflicts (multiple tasks due same day with high estimated hours)
-        daily_hours = {}
+        daily_hours = Counter()
         for task in tasks:
-            day = task.due_date.date()
-            hours = task.estimated_hours or 3.0
-            daily_hours[day] = daily_hours.get(day, 0) + hours
+            daily_hours[day_of[id(task)]] += task.estimated_hours or 3.0
         
         for day, hours in daily_hours.items():
             if hours > self.preferences.preferred_study_hours_per_day * 2:
@@ -195,81 +312,121 @@ class SlugPilotAgent:
         
         return conflicts
     
-    def _distribute_tasks(self, tasks: List[Task]) -> List[Task]:
+    def _distribute_tasks(
+        self,
+        tasks: List[Task],
+        day_of: Optional[Dict[int, date]] = None,
+        now: Optional[datetime] = None
+    ) -> List[Task]:
         """Distribute tasks across the week based on due dates and estimated hours"""
         distributed = []
         daily_capacity = self.preferences.preferred_study_hours_per_day
+        if day_of is None:
+            day_of = {id(t): t.due_date.date() for t in tasks}
         
         # Group tasks by day
-        tasks_by_day = {}
+        tasks_by_day = defaultdict(list)
         for task in tasks:
-            day = task.due_date.date()
-            if day not in tasks_by_day:
-                tasks_by_day[day] = []
-            tasks_by_day[day].append(task)
-        
-        # Distribute tasks ensuring we don't overload any day
+            tasks_by_day[day_of[id(task)]].append(task)
+        
+        # Pack tasks into days without exceeding the daily limit. Tasks arrive in
+        # priority order from _prioritize_tasks and grouping keeps that order.
+        max_load = daily_capacity * 1.5
+        load = Counter()
+        today = (now or datetime.now()).date()
+        one_day = timedelta(days=1)
         for day, day_tasks in sorted(tasks_by_day.items()):
-            day_hours = 0
-            for task in sorted(day_tasks, key=lambda t: t.priority.value):
+            for task in day_tasks:
                 task_hours = task.estimated_hours or 3.0
+                target = day
                 
-                # If adding this task would exceed capacity, mark for earlier scheduling
-                if day_hours + task_hours > daily_capacity * 1.5:
-                    # Suggest moving to previous day if possible
-                    prev_day = day - timedelta(days=1)
-                    if prev_day >= datetime.now().date():
-                        task.due_date = datetime.combine(prev_day, task.due_date.time())
+                # If this task would overload its day, move it to the latest
+                # earlier day (not in the past) that still has room. When none
+                # does, fall back to the previous day.
+                if load[day] + task_hours > max_load:
+                    candidate = day - one_day
+                    target = candidate if candidate >= today else day
+                    while candidate >= today:
+                        if load[candidate] + task_hours <= max_load:
+                            target = candidate
+                            break
+                        candidate -= one_day
+                    if target != day:
+                        task.due_date = datetime.combine(target, task.due_date.time())
                 
-                day_hours += task_hours
+                load[target] += task_hours
                 distributed.append(task)
         
         return distributed
     
-    def revise_plan(self, new_deadlines: Optional[List[Deadline]] = None) -> List[Task]:
+    async def revise_plan(self, new_deadlines: Optional[List[Deadline]] = None) -> List[Task]:
         """
         Revise the weekly plan when deadlines shift.
         This is the core revision function.
         """
         # Gather fresh tasks
-        all_tasks = self.gather_all_tasks()
+        self.invalidate_cache()
+        all_tasks = await self.gather_all_tasks()
         
         # If new deadlines provided, incorporate them
         if new_deadlines and self.canvas_service:
             new_tasks = self.canvas_service.get_tasks_from_deadlines(new_deadlines)
-            all_tasks.extend(new_tasks)
+            all_tasks = all_tasks + new_tasks
         
         # Re-plan
-        return self.create_weekly_plan()
+        return await self.create_weekly_plan()
     
-    def check_academic_health(self) -> Dict:
-        """Monitor academic health and identify risks"""
-        all_tasks = self.gather_all_tasks()
-        now = datetime.now()
+    async def sync_study_plans(self, study_plans: List[StudyPlan]):
+        """Sync study plans to the calendar, overlapping plans but capping in-flight API writes"""
+        if not study_plans or not self.calendar_service:
+            return
+        semaphore = asyncio.Semaphore(CALENDAR_SYNC_CONCURRENCY)
         
-        overdue = [t for t in all_tasks if t.status == TaskStatus.OVERDUE]
-        critical_upcoming = [
-            t for t in all_tasks 
-            if t.priority == TaskPriority.CRITICAL 
-            and t.due_date > now 
-            and (t.due_date - now).days <= 2
-        ]
+        async def sync_plan(plan: StudyPlan):
+            async with semaphore:
+                await asyncio.to_thread(self.calendar_service.sync_study_sessions, plan.calendar_sessions())
         
-        # Calculate workload for next 7 days
-        week_tasks = [t for t in all_tasks if (t.due_date - now).days <= 7]
-        total_hours = sum(t.estimated_hours or 3.0 for t in week_tasks)
-        daily_avg = total_hours / 7 if week_tasks else 0
+        await asyncio.gather(*(sync_plan(plan) for plan in study_plans))
+    
+    @ttl_cache(CACHE_TTL_SECONDS)
+    async def check_academic_health(self) -> Dict:
+        """Monitor academic health and identify risks"""
+        return self._check_academic_health_from(await self.gather_all_tasks())
+    
+    def _check_academic_health_from(self, all_tasks: List[Task], now: Optional[datetime] = None) -> Dict:
+        """Compute the health report for an already gathered task list"""
+        now_ts = epoch_seconds(now or datetime.now())
+        
+        # Single pass: overdue, critical due soon, and workload for next 7 days.
+        # Only the counts are reported, so keep plain counters instead of lists.
+        overdue_count = 0
+        critical_upcoming = 0
+        week_count = 0
+        total_hours = 0.0
+        overdue_status = TaskStatus.OVERDUE
+        critical_priority = TaskPriority.CRITICAL
+        for t in all_tasks:
+            due_ts = t.due_timestamp()
+            days = (due_ts - now_ts) // SECONDS_PER_DAY
+            if t.status == overdue_status:
+                overdue_count += 1
+            if days <= 2 and t.priority == critical_priority and due_ts > now_ts:
+                critical_upcoming += 1
+            if days <= 7:
+                week_count += 1
+                total_hours += t.estimated_hours or 3.0
+        daily_avg = total_hours / 7 if week_count else 0
         
         health_score = 100
         warnings = []
         
-        if overdue:
-            health_score -= len(overdue) * 10
-            warnings.append(f"{len(overdue)} overdue task(s)")
+        if overdue_count:
+            health_score -= overdue_count * 10
+            warnings.append(f"{overdue_count} overdue task(s)")
         
-        if len(critical_upcoming) > 2:
+        if critical_upcoming > 2:
             health_score -= 20
-            warnings.append(f"{len(critical_upcoming)} critical tasks due soon")
+            warnings.append(f"{critical_upcoming} critical tasks due soon")
         
         if daily_avg > self.preferences.preferred_study_hours_per_day * 1.5:
             health_score -= 15
@@ -281,16 +438,20 @@ class SlugPilotAgent:
             "score": max(0, health_score),
             "status": health_status,
             "warnings": warnings,
-            "overdue_count": len(overdue),
-            "critical_upcoming": len(critical_upcoming),
+            "overdue_count": overdue_count,
+            "critical_upcoming": critical_upcoming,
             "weekly_hours": total_hours,
             "daily_average": daily_avg
         }
     
-    def should_nudge(self) -> bool:
+    async def should_nudge(self) -> bool:
         """Determine if user should be nudged"""
-        health = self.check_academic_health()
-        
+        all_tasks = await self.gather_all_tasks()
+        health = await self.check_academic_health()
+        return self._should_nudge_from(all_tasks, health)
+    
+    def _should_nudge_from(self, all_tasks: List[Task], health: Dict, now: Optional[datetime] = None) -> bool:
+        """Nudge decision for an already gathered task list and health report"""
         # Nudge conditions
         if health["status"] == "critical":
             return True
@@ -298,8 +459,7 @@ class SlugPilotAgent:
             return True
         
         # Check for tasks approaching nudge threshold
-        all_tasks = self.gather_all_tasks()
-        now = datetime.now()
+        now = now or datetime.now()
         approaching_deadlines = [
             t for t in all_tasks
             if t.status == TaskStatus.PENDING
@@ -333,76 +493,108 @@ class SlugPilotAgent:
         
         return questions
     
-    def make_autonomous_decisions(self) -> List[Dict]:
+    async def make_autonomous_decisions(self) -> List[Dict]:
         """
         Make autonomous decisions to keep the user academically safe.
         This is the core agentic decision-making function.
         """
-        decisions = []
-        all_tasks = self.gather_all_tasks()
-        health = self.check_academic_health()
-        
-        # Decision 1: Auto-prioritize overdue tasks
-        overdue_tasks = [t for t in all_tasks if t.status == TaskStatus.OVERDUE]
-        if overdue_tasks:
-            for task in overdue_tasks:
+        return self._make_decisions_from(await self.gather_all_tasks())
+    
+    def _make_decisions_from(self, all_tasks: List[Task], now: Optional[datetime] = None) -> List[Dict]:
+        """Apply the autonomous decisions to an already gathered task list"""
+        prioritize = []
+        escalate = []
+        breakdown = []
+        critical_count = 0
+        now_ts = epoch_seconds(now or datetime.now())
+        
+        # Single pass over the tasks; each decision type keeps its own bucket
+        # so the returned order matches the original one
+        for task in all_tasks:
+            # Decision 1: Auto-prioritize overdue tasks
+            if task.status == TaskStatus.OVERDUE:
                 if task.priority != TaskPriority.CRITICAL:
                     task.priority = TaskPriority.CRITICAL
-                    decisions.append({
+                    prioritize.append({
                         "type": "auto_prioritize",
                         "task": task.title,
                         "reason": "Task is overdue",
                         "action": f"Set priority to CRITICAL"
                     })
-        
-        # Decision 2: Auto-adjust priorities based on proximity to deadline
-        now = datetime.now()
-        for task in all_tasks:
-            if task.status == TaskStatus.PENDING:
-                days_until = (task.due_date - now).days
-                
-                # Escalate priority if deadline is very close
-                if days_until <= 1 and task.priority != TaskPriority.CRITICAL:
-                    old_priority = task.priority
-                    task.priority = TaskPriority.CRITICAL
-                    decisions.append({
-                        "type": "auto_escalate",
-                        "task": task.title,
-                        "reason": f"Due in {days_until} day(s)",
-                        "action": f"Escalated from {old_priority.value} to CRITICAL"
-                    })
-                elif days_until <= 2 and task.priority == TaskPriority.LOW:
-                    task.priority = TaskPriority.MEDIUM
-                    decisions.append({
-                        "type": "auto_escalate",
-                        "task": task.title,
-                        "reason": f"Due in {days_until} days",
-                        "action": "Escalated from LOW to MEDIUM"
-                    })
-        
-        # Decision 3: Suggest breaking down large tasks
-        for task in all_tasks:
+                continue
+            
+            if task.status != TaskStatus.PENDING:
+                continue
+            
+            # Decision 2: Auto-adjust priorities based on proximity to deadline
+            days_until = int((task.due_timestamp() - now_ts) // SECONDS_PER_DAY)
+            if days_until <= 1 and task.priority != TaskPriority.CRITICAL:
+                old_priority = task.priority
+                task.priority = TaskPriority.CRITICAL
+                escalate.append({
+                    "type": "auto_escalate",
+                    "task": task.title,
+                    "reason": f"Due in {days_until} day(s)",
+                    "action": f"Escalated from {old_priority.value} to CRITICAL"
+                })
+            elif days_until <= 2 and task.priority == TaskPriority.LOW:
+                task.priority = TaskPriority.MEDIUM
+                escalate.append({
+                    "type": "auto_escalate",
+                    "task": task.title,
+                    "reason": f"Due in {days_until} days",
+                    "action": "Escalated from LOW to MEDIUM"
+                })
+            
+            # Decision 3: Suggest breaking down large tasks
             if task.estimated_hours and task.estimated_hours > 8:
-                if task.status == TaskStatus.PENDING:
-                    decisions.append({
-                        "type": "suggest_breakdown",
-                        "task": task.title,
-                        "reason": f"Large task ({task.estimated_hours}h estimated)",
-                        "action": "Consider breaking into smaller subtasks"
-                    })
+                breakdown.append({
+                    "type": "suggest_breakdown",
+                    "task": task.title,
+                    "reason": f"Large task ({task.estimated_hours}h estimated)",
+                    "action": "Consider breaking into smaller subtasks"
+                })
+            
+            if task.priority == TaskPriority.CRITICAL:
+                critical_count += 1
+        
+        decisions = prioritize + escalate + breakdown
         
         # Decision 4: Auto-create buffer time for critical tasks
-        critical_tasks = [t for t in all_tasks if t.priority == TaskPriority.CRITICAL and t.status == TaskStatus.PENDING]
-        if len(critical_tasks) > 3:
+        if critical_count > 3:
             decisions.append({
                 "type": "suggest_buffer",
-                "reason": f"{len(critical_tasks)} critical tasks detected",
+                "reason": f"{critical_count} critical tasks detected",
                 "action": "Consider requesting extensions or reprioritizing"
             })
         
         return decisions
     
-    def execute_autonomous_actions(self) -> Dict:
+    async def compute_full_state(self) -> Dict:
+        """
+        Derive plan, health, nudge, questions and decisions from a single
+        gather so a page load fans out to the services only once.
+        """
+        all_tasks = await self.gather_all_tasks()
+        now = datetime.now()
+        
+        # Health and nudge read the tasks as gathered; decisions and planning
+        # update tasks in place, so each works on its own copies
+        health = self._check_academic_health_from(all_tasks, now)
+        should_nudge = self._should_nudge_from(all_tasks, health, now)
+        decisions = self._make_decisions_from(_copy_tasks(all_tasks), now)
+        weekly_plan = self._create_weekly_plan_from(_copy_tasks(all_tasks), now)
+        
+        return {
+            "weekly_plan": weekly_plan,
+            "academic_health": health,
+            "should_nudge": should_nudge,
+            "conflicts": self.conflicts,
+            "clarifying_questions": self.get_clarifying_questions(),
+            "autonomous_decisions": decisions
+        }
+    
+    async def execute_autonomous_actions(self) -> Dict:
         """
         Execute autonomous actions based on current state.
         Returns summary of actions taken.
@@ -414,17 +606,22 @@ class SlugPilotAgent:
             "study_plans_created": False
         }
         
+        all_tasks = await self.gather_all_tasks()
+        now = datetime.now()
+        
+        # Check health first, on the tasks as gathered
+        health = self._check_academic_health_from(all_tasks, now)
+        
         # Make autonomous decisions
-        decisions = self.make_autonomous_decisions()
+        decisions = self._make_decisions_from(_copy_tasks(all_tasks), now)
         actions_taken["decisions_made"] = decisions
         
         # Check if plan needs updating
         if not self.weekly_plan or not self.last_plan_update:
-            self.create_weekly_plan()
+            self._create_weekly_plan_from(_copy_tasks(all_tasks), now)
             actions_taken["plans_created"] = True
         
-        # Check health and take action
-        health = self.check_academic_health()
+        # Take action on health
         if health["status"] == "critical":
             # Emergency plan already handled in agent loop, but mark as action
             actions_taken["notifications_sent"] = True
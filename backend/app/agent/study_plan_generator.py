@@ -1,15 +1,89 @@
+import re
+from collections import OrderedDict, defaultdict
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from app.models.study_plan import StudyPlan, StudySession
 from app.models.deadline import Deadline
 from app.models.user import UserPreferences
 
+# Base study hours by exam type, checked in order against the lowercased title
+_BASE_HOURS = (
+    ("midterm", 12.0),
+    ("final", 20.0),
+    ("quiz", 3.0),
+    ("exam", 10.0),
+)
+
+# Deadline titles containing any of these get a study plan
+_EXAM_KEYWORDS = ("exam", "midterm", "final", "test", "quiz")
+_EXAM_RE = re.compile("|".join(map(re.escape, _EXAM_KEYWORDS)), re.IGNORECASE)
+
+# Generated plans depend only on the request and how many days are left, so
+# their session layout is cached as a template and re-anchored to each exam
+# date. Templates hold (days before exam, topic, hours, materials) per session.
+# Each user keeps up to PLAN_TEMPLATE_CACHE_SIZE templates.
+PLAN_TEMPLATE_CACHE_SIZE = 256
+PlanTemplateKey = Tuple[str, str, Tuple[str, ...], Optional[float], int]
+PlanTemplate = Tuple[float, Tuple[Tuple[int, str, float, Tuple[str, ...]], ...]]
+
+
+class PlanTemplateCache:
+    """
+    Least-frequently-used cache of plan templates. Keys are bucketed by hit
+    count, so lookups, inserts and evictions are all O(1); ties evict the
+    entry that has sat longest at the lowest count.
+    """
+    
+    def __init__(self, maxsize: int = PLAN_TEMPLATE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries: Dict[PlanTemplateKey, Tuple[PlanTemplate, int]] = {}
+        self._by_hits: Dict[int, "OrderedDict[PlanTemplateKey, None]"] = defaultdict(OrderedDict)
+        self._min_hits = 0
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, key: PlanTemplateKey) -> Optional[PlanTemplate]:
+        """Return a cached template and count the hit"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        template, hits = entry
+        self._unlink(key, hits)
+        self._by_hits[hits + 1][key] = None
+        self._entries[key] = (template, hits + 1)
+        return template
+    
+    def put(self, key: PlanTemplateKey, template: PlanTemplate):
+        """Cache a template, evicting the least frequently used one when full"""
+        if key in self._entries:
+            self._entries[key] = (template, self._entries[key][1])
+            return
+        if len(self._entries) >= self.maxsize:
+            coldest = next(iter(self._by_hits[self._min_hits]))
+            self._unlink(coldest, self._min_hits)
+            del self._entries[coldest]
+        self._entries[key] = (template, 0)
+        self._by_hits[0][key] = None
+        self._min_hits = 0
+    
+    def _unlink(self, key: PlanTemplateKey, hits: int):
+        """Remove a key from its hit-count bucket"""
+        bucket = self._by_hits[hits]
+        del bucket[key]
+        if not bucket:
+            del self._by_hits[hits]
+            if self._min_hits == hits:
+                self._min_hits = hits + 1
+
 
 class StudyPlanGenerator:
     """Generates study plans for exams and major assignments"""
     
-    def __init__(self, preferences: UserPreferences):
+    def __init__(self, preferences: UserPreferences, templates: Optional[PlanTemplateCache] = None):
         self.preferences = preferences
+        # Pass the user's cache (SlugPilotAgent.plan_templates) to reuse layouts across calls
+        self.templates = templates if templates is not None else PlanTemplateCache()
     
     def generate_study_plan(
         self,
@@ -32,6 +106,15 @@ class StudyPlanGenerator:
         # Calculate days until exam
         days_until_exam = (exam_date - datetime.now()).days
         
+        # Reuse a cached layout for the same request and lead time. Exams that
+        # are today or past get an "in one hour" session, which isn't cacheable.
+        cache_key = None
+        if self.preferences.plan_cache_enabled and days_until_exam > 0:
+            cache_key = (course, exam_title, tuple(topics or ()), total_study_hours, days_until_exam)
+            template = self.templates.get(cache_key)
+            if template is not None:
+                return self._plan_from_template(course, exam_date, exam_title, template)
+        
         # Estimate total study hours if not provided
         if total_study_hours is None:
             total_study_hours = self._estimate_study_hours(exam_title, days_until_exam)
@@ -41,9 +124,13 @@ class StudyPlanGenerator:
             course=course,
             exam_date=exam_date,
             topics=topics or [],
-            total_hours=total_study_hours
+            total_hours=total_study_hours,
+            days_until=days_until_exam
         )
         
+        if cache_key is not None:
+            self._store_template(cache_key, exam_date, total_study_hours, sessions)
+        
         study_plan = StudyPlan(
             course=course,
             exam_date=exam_date,
@@ -55,20 +142,61 @@ class StudyPlanGenerator:
         
         return study_plan
     
+    def _store_template(
+        self,
+        key: PlanTemplateKey,
+        exam_date: datetime,
+        total_hours: float,
+        sessions: List[StudySession]
+    ):
+        """Cache a generated plan's session layout relative to its exam date"""
+        exam_day = exam_date.date()
+        layout = tuple(
+            (
+                (exam_day - s.scheduled_time.date()).days,
+                s.topic,
+                s.duration_hours,
+                tuple(s.materials)
+            )
+            for s in sessions
+        )
+        self.templates.put(key, (total_hours, layout))
+    
+    def _plan_from_template(
+        self,
+        course: str,
+        exam_date: datetime,
+        exam_title: str,
+        template: PlanTemplate
+    ) -> StudyPlan:
+        """Build a plan from a cached layout, anchored to this exam date"""
+        total_hours, layout = template
+        start_time = self.preferences.preferred_start_time()
+        sessions = [
+            StudySession(
+                course=course,
+                topic=topic,
+                duration_hours=duration,
+                scheduled_time=datetime.combine((exam_date - timedelta(days=days_before)).date(), start_time),
+                materials=list(materials)
+            )
+            for days_before, topic, duration, materials in layout
+        ]
+        return StudyPlan(
+            course=course,
+            exam_date=exam_date,
+            exam_title=exam_title,
+            sessions=sessions,
+            total_hours=total_hours,
+            status="active"
+        )
+    
     def _estimate_study_hours(self, exam_title: str, days_until: int) -> float:
         """Estimate total study hours needed"""
-        # Base hours based on exam type
-        base_hours = {
-            "midterm": 12.0,
-            "final": 20.0,
-            "quiz": 3.0,
-            "exam": 10.0,
-        }
-        
         exam_lower = exam_title.lower()
         base = 10.0  # default
         
-        for exam_type, hours in base_hours.items():
+        for exam_type, hours in _BASE_HOURS:
             if exam_type in exam_lower:
                 base = hours
                 break
@@ -88,11 +216,13 @@ class StudyPlanGenerator:
         course: str,
         exam_date: datetime,
         topics: List[str],
-        total_hours: float
+        total_hours: float,
+        days_until: Optional[int] = None
     ) -> List[StudySession]:
         """Create study sessions distributed before the exam"""
         sessions = []
-        days_until = (exam_date - datetime.now()).days
+        if days_until is None:
+            days_until = (exam_date - datetime.now()).days
         
         if days_until <= 0:
             # Exam is today or past - create immediate session
@@ -159,18 +289,7 @@ class StudyPlanGenerator:
     
     def _get_preferred_time(self, date: datetime) -> datetime:
         """Get preferred study time based on user preferences"""
-        # Parse preferred times (format: "09:00-12:00")
-        preferred_times = self.preferences.preferred_study_times
-        
-        if preferred_times:
-            # Use first preferred time slot
-            time_str = preferred_times[0].split("-")[0]  # "09:00"
-            hour, minute = map(int, time_str.split(":"))
-        else:
-            # Default to 10 AM
-            hour, minute = 10, 0
-        
-        return datetime.combine(date.date(), datetime.min.time().replace(hour=hour, minute=minute))
+        return datetime.combine(date.date(), self.preferences.preferred_start_time())
     
     def auto_create_for_upcoming_exams(
         self,
@@ -184,14 +303,13 @@ class StudyPlanGenerator:
         now = datetime.now()
         study_plans = []
         
-        # Find exam deadlines
-        exam_keywords = ["exam", "midterm", "final", "test", "quiz"]
-        exam_deadlines = [
-            d for d in deadlines
-            if any(keyword in d.title.lower() for keyword in exam_keywords)
-            and d.due_date > now
-            and (d.due_date - now).days <= days_before + 1
-        ]
+        # Find exam deadlines; date checks are cheaper than the keyword scan so run first
+        exam_deadlines = []
+        for d in deadlines:
+            if d.due_date <= now or (d.due_date - now).days > days_before + 1:
+                continue
+            if _EXAM_RE.search(d.title):
+                exam_deadlines.append(d)
         
         for deadline in exam_deadlines:
             # Check if we should create a plan (within threshold)
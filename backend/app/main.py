@@ -1,5 +1,6 @@
-from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from typing import List, Optional
 from datetime import datetime, timedelta
 from pydantic import BaseModel
@@ -12,12 +13,21 @@ from app.agent.slugpilot_agent import SlugPilotAgent
 from app.agent.study_plan_generator import StudyPlanGenerator
 from app.agent.notification_service import NotificationService
 from app.agent.agent_manager import agent_manager
+from collections import OrderedDict
+from operator import attrgetter
+from uuid import uuid4
 import asyncio
+import heapq
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
 
 app = FastAPI(
     title="SlugPilot API",
     description="An Autonomous Student Life Agent - AI chief of staff for college students",
-    version="1.0.0"
+    version="1.0.0",
+    # Responses are validated/serialized by pydantic, then written with orjson
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware
@@ -33,19 +43,37 @@ app.add_middleware(
 users_db = {}
 agents_db = {}
 
+# Background jobs for slow endpoints called with ?background=true; only the
+# most recent MAX_JOBS are kept
+MAX_JOBS = 1000
+jobs_db: "OrderedDict[str, dict]" = OrderedDict()
+
+# Agent logs are queued and written by a background thread, so logging from
+# agent cycles never blocks the event loop on stdout
+log_queue: queue.Queue = queue.Queue(-1)
+log_handler = logging.StreamHandler()
+log_handler.setFormatter(logging.Formatter("[%(name)s] %(levelname)s: %(message)s"))
+log_listener = QueueListener(log_queue, log_handler)
+app_logger = logging.getLogger("app")
+app_logger.setLevel(logging.INFO)
+app_logger.addHandler(QueueHandler(log_queue))
+logger = logging.getLogger(__name__)
+
 # Startup and shutdown events
 @app.on_event("startup")
 async def startup_event():
     """Start all registered agents on startup"""
-    print("[Startup] SlugPilot API starting...")
+    log_listener.start()
+    logger.info("SlugPilot API starting...")
     # Agents will be started when users are created/registered
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Stop all agents on shutdown"""
-    print("[Shutdown] Stopping all agents...")
+    logger.info("Stopping all agents...")
     await agent_manager.stop_all_agents()
+    log_listener.stop()
 
 
 # Request/Response models
@@ -74,6 +102,48 @@ class StudyPlanCreate(BaseModel):
     total_study_hours: Optional[float] = None
 
 
+_due_date = attrgetter("due_date")
+
+
+def _submit_job(background_tasks: BackgroundTasks, user_id: str, kind: str, run) -> ORJSONResponse:
+    """Run `run()` after the response is sent and return 202 with a job to poll"""
+    job_id = str(uuid4())
+    jobs_db[job_id] = {
+        "job_id": job_id,
+        "user_id": user_id,
+        "kind": kind,
+        "status": "pending",
+        "result": None,
+        "error": None,
+        "created_at": datetime.now(),
+        "finished_at": None
+    }
+    while len(jobs_db) > MAX_JOBS:
+        jobs_db.popitem(last=False)
+    
+    background_tasks.add_task(_run_job, job_id, run)
+    return ORJSONResponse(
+        status_code=202,
+        content={"job_id": job_id, "status": "pending", "status_url": f"/jobs/{job_id}"}
+    )
+
+
+async def _run_job(job_id: str, run):
+    """Execute a background job and record its outcome"""
+    job = jobs_db.get(job_id)
+    if job is None:
+        return
+    job["status"] = "running"
+    try:
+        job["result"] = await run()
+        job["status"] = "completed"
+    except Exception as e:
+        logger.exception("Error in job %s: %s", job_id, e)
+        job["error"] = str(e)
+        job["status"] = "failed"
+    job["finished_at"] = datetime.now()
+
+
 # Dependency to get user agent
 def get_agent(user_id: str) -> SlugPilotAgent:
     if user_id not in agents_db:
@@ -81,30 +151,9 @@ def get_agent(user_id: str) -> SlugPilotAgent:
     return agents_db[user_id]
 
 
-# Helper function to start agent in background
-def start_agent_background(user_id: str):
-    """Start agent in background using asyncio"""
-    try:
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            # If loop is running, schedule the task
-            asyncio.create_task(agent_manager.start_agent(user_id))
-        else:
-            # If no loop, create one
-            loop.run_until_complete(agent_manager.start_agent(user_id))
-    except RuntimeError:
-        # No event loop, create one in a thread
-        import threading
-        def run_agent():
-            new_loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(new_loop)
-            new_loop.run_until_complete(agent_manager.start_agent(user_id))
-        thread = threading.Thread(target=run_agent, daemon=True)
-        thread.start()
-
 # User Management Endpoints
 @app.post("/users", response_model=User)
-def create_user(user_data: UserCreate):
+async def create_user(user_data: UserCreate):
     """Create a new user and initialize their SlugPilot agent"""
     user = User(
         email=user_data.email,
@@ -119,13 +168,11 @@ def create_user(user_data: UserCreate):
     )
     user.id = user_data.email  # Simple ID for demo
     
-    # Initialize agent
-    agent = SlugPilotAgent(user)
-    agents_db[user.id] = agent
-    users_db[user.id] = user
-    
-    # Register agent (but don't auto-start - user can start via endpoint)
+    # Register agent (but don't auto-start - user can start via endpoint).
+    # The endpoints share the manager's agent so both see the same caches.
     agent_manager.register_agent(user)
+    agents_db[user.id] = agent_manager.get_agent(user.id)
+    users_db[user.id] = user
     
     return user
 
@@ -140,73 +187,92 @@ def get_user(user_id: str):
 
 # Task Management Endpoints
 @app.get("/users/{user_id}/tasks", response_model=List[Task])
-def get_all_tasks(user_id: str, agent: SlugPilotAgent = Depends(get_agent)):
+async def get_all_tasks(user_id: str, agent: SlugPilotAgent = Depends(get_agent)):
     """Get all tasks from all sources"""
-    tasks = agent.gather_all_tasks()
+    tasks = await agent.gather_all_tasks()
     return tasks
 
 
 @app.get("/users/{user_id}/tasks/upcoming", response_model=List[Task])
-def get_upcoming_tasks(user_id: str, days: int = 7, agent: SlugPilotAgent = Depends(get_agent)):
-    """Get upcoming tasks within specified days"""
-    all_tasks = agent.gather_all_tasks()
+async def get_upcoming_tasks(
+    user_id: str,
+    days: int = 7,
+    limit: Optional[int] = Query(None, ge=1),
+    agent: SlugPilotAgent = Depends(get_agent)
+):
+    """Get upcoming tasks within specified days, soonest first (optionally only the first `limit`)"""
+    all_tasks = await agent.gather_all_tasks()
     cutoff = datetime.now() + timedelta(days=days)
-    upcoming = [t for t in all_tasks if t.due_date <= cutoff]
-    return sorted(upcoming, key=lambda t: t.due_date)
+    upcoming = (t for t in all_tasks if t.due_date <= cutoff)
+    if limit is not None:
+        return heapq.nsmallest(limit, upcoming, key=_due_date)
+    return sorted(upcoming, key=_due_date)
 
 
 @app.get("/users/{user_id}/tasks/overdue", response_model=List[Task])
-def get_overdue_tasks(user_id: str, agent: SlugPilotAgent = Depends(get_agent)):
+async def get_overdue_tasks(user_id: str, agent: SlugPilotAgent = Depends(get_agent)):
     """Get all overdue tasks"""
-    all_tasks = agent.gather_all_tasks()
+    all_tasks = await agent.gather_all_tasks()
     overdue = [t for t in all_tasks if t.status == TaskStatus.OVERDUE]
     return overdue
 
 
 @app.patch("/users/{user_id}/tasks/{task_id}")
-def update_task(user_id: str, task_id: str, update: TaskUpdate, agent: SlugPilotAgent = Depends(get_agent)):
+async def update_task(user_id: str, task_id: str, update: TaskUpdate, agent: SlugPilotAgent = Depends(get_agent)):
     """Update a task's status or priority"""
     # In a real implementation, would update task in database
-    # For now, return success
-    return {"message": "Task updated", "task_id": task_id, **update.dict(exclude_unset=True)}
+    # For now, drop the cached task list so later reads re-fetch, and return success
+    agent.invalidate_cache()
+    
+    # Let a running autonomous agent react now instead of at its next scheduled cycle
+    agent_manager.poke_agent(user_id)
+    return {"message": "Task updated", "task_id": task_id, **update.model_dump(exclude_unset=True)}
 
 
 # Planning Endpoints
 @app.post("/users/{user_id}/plan/weekly", response_model=List[Task])
-def create_weekly_plan(user_id: str, agent: SlugPilotAgent = Depends(get_agent)):
-    """Create or update the weekly plan"""
-    plan = agent.create_weekly_plan()
+async def create_weekly_plan(
+    user_id: str,
+    background_tasks: BackgroundTasks,
+    background: bool = False,
+    agent: SlugPilotAgent = Depends(get_agent)
+):
+    """Create or update the weekly plan (with ?background=true, returns a job to poll)"""
+    if background:
+        return _submit_job(background_tasks, user_id, "weekly_plan", agent.create_weekly_plan)
+    
+    plan = await agent.create_weekly_plan()
     return plan
 
 
 @app.get("/users/{user_id}/plan/weekly", response_model=List[Task])
-def get_weekly_plan(user_id: str, agent: SlugPilotAgent = Depends(get_agent)):
+async def get_weekly_plan(user_id: str, agent: SlugPilotAgent = Depends(get_agent)):
     """Get the current weekly plan"""
     if not agent.weekly_plan:
-        agent.create_weekly_plan()
+        await agent.create_weekly_plan()
     return agent.weekly_plan
 
 
 @app.post("/users/{user_id}/plan/revise", response_model=List[Task])
-def revise_plan(user_id: str, agent: SlugPilotAgent = Depends(get_agent)):
+async def revise_plan(user_id: str, agent: SlugPilotAgent = Depends(get_agent)):
     """Revise the weekly plan (called when deadlines shift)"""
-    revised_plan = agent.revise_plan()
+    revised_plan = await agent.revise_plan()
     return revised_plan
 
 
 # Academic Health Endpoints
 @app.get("/users/{user_id}/health")
-def get_academic_health(user_id: str, agent: SlugPilotAgent = Depends(get_agent)):
+async def get_academic_health(user_id: str, agent: SlugPilotAgent = Depends(get_agent)):
     """Get academic health status"""
-    health = agent.check_academic_health()
+    health = await agent.check_academic_health()
     return health
 
 
 @app.get("/users/{user_id}/conflicts")
-def get_conflicts(user_id: str, agent: SlugPilotAgent = Depends(get_agent)):
+async def get_conflicts(user_id: str, agent: SlugPilotAgent = Depends(get_agent)):
     """Get detected conflicts and clarifying questions"""
     if not agent.weekly_plan:
-        agent.create_weekly_plan()
+        await agent.create_weekly_plan()
     
     questions = agent.get_clarifying_questions()
     return {
@@ -217,9 +283,9 @@ def get_conflicts(user_id: str, agent: SlugPilotAgent = Depends(get_agent)):
 
 # Study Plan Endpoints
 @app.post("/users/{user_id}/study-plans", response_model=StudyPlan)
-def create_study_plan(user_id: str, plan_data: StudyPlanCreate, agent: SlugPilotAgent = Depends(get_agent)):
+async def create_study_plan(user_id: str, plan_data: StudyPlanCreate, agent: SlugPilotAgent = Depends(get_agent)):
     """Create a study plan for an exam"""
-    generator = StudyPlanGenerator(agent.preferences)
+    generator = StudyPlanGenerator(agent.preferences, agent.plan_templates)
     study_plan = generator.generate_study_plan(
         course=plan_data.course,
         exam_date=plan_data.exam_date,
@@ -230,63 +296,61 @@ def create_study_plan(user_id: str, plan_data: StudyPlanCreate, agent: SlugPilot
     
     # Auto-sync to calendar if enabled
     if agent.user.preferences.auto_create_study_plans and agent.calendar_service:
-        sessions_data = [
-            {
-                "course": s.course,
-                "topic": s.topic,
-                "duration_hours": s.duration_hours,
-                "scheduled_time": s.scheduled_time.isoformat(),
-                "materials": s.materials
-            }
-            for s in study_plan.sessions
-        ]
-        agent.calendar_service.sync_study_sessions(sessions_data)
+        await asyncio.to_thread(agent.calendar_service.sync_study_sessions, study_plan.calendar_sessions())
     
     return study_plan
 
 
 @app.post("/users/{user_id}/study-plans/auto-create", response_model=List[StudyPlan])
-def auto_create_study_plans(user_id: str, agent: SlugPilotAgent = Depends(get_agent)):
-    """Automatically create study plans for upcoming exams"""
+async def auto_create_study_plans(
+    user_id: str,
+    background_tasks: BackgroundTasks,
+    background: bool = False,
+    agent: SlugPilotAgent = Depends(get_agent)
+):
+    """Automatically create study plans for upcoming exams (with ?background=true, returns a job to poll)"""
     if not agent.canvas_service:
         raise HTTPException(status_code=400, detail="Canvas service not configured")
     
-    deadlines = agent.canvas_service.get_deadlines()
-    generator = StudyPlanGenerator(agent.preferences)
+    if background:
+        return _submit_job(background_tasks, user_id, "study_plans", lambda: _auto_create_study_plans(agent))
+    
+    return await _auto_create_study_plans(agent)
+
+
+async def _auto_create_study_plans(agent: SlugPilotAgent) -> List[StudyPlan]:
+    """Create study plans for upcoming exams and sync them to the calendar"""
+    deadlines = await asyncio.to_thread(agent.canvas_service.get_deadlines)
+    generator = StudyPlanGenerator(agent.preferences, agent.plan_templates)
     study_plans = generator.auto_create_for_upcoming_exams(deadlines)
     
-    # Sync to calendar
-    if agent.calendar_service:
-        for plan in study_plans:
-            sessions_data = [
-                {
-                    "course": s.course,
-                    "topic": s.topic,
-                    "duration_hours": s.duration_hours,
-                    "scheduled_time": s.scheduled_time.isoformat(),
-                    "materials": s.materials
-                }
-                for s in plan.sessions
-            ]
-            agent.calendar_service.sync_study_sessions(sessions_data)
+    await agent.sync_study_plans(study_plans)
     
     return study_plans
 
 
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Get the status (and result, once completed) of a background job"""
+    if job_id not in jobs_db:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return jobs_db[job_id]
+
+
 # Notification Endpoints
 @app.post("/users/{user_id}/nudge")
-def send_nudge(user_id: str, agent: SlugPilotAgent = Depends(get_agent)):
+async def send_nudge(user_id: str, agent: SlugPilotAgent = Depends(get_agent)):
     """Check if user should be nudged and send notification"""
-    if not agent.should_nudge():
+    if not await agent.should_nudge():
         return {"should_nudge": False, "message": "No nudge needed"}
     
-    all_tasks = agent.gather_all_tasks()
-    health = agent.check_academic_health()
+    all_tasks = await agent.gather_all_tasks()
+    health = await agent.check_academic_health()
     
     notification_service = NotificationService(agent.user)
-    message = notification_service.generate_nudge_message(all_tasks, health)
+    message = notification_service.generate_nudge_message(agent.build_snapshot(all_tasks), health)
     
-    success = notification_service.send_nudge(message, priority=health["status"])
+    success = await notification_service.send_nudge(message, priority=health["status"])
     
     return {
         "should_nudge": True,
@@ -297,15 +361,15 @@ def send_nudge(user_id: str, agent: SlugPilotAgent = Depends(get_agent)):
 
 
 @app.post("/users/{user_id}/notifications/weekly-summary")
-def send_weekly_summary(user_id: str, agent: SlugPilotAgent = Depends(get_agent)):
+async def send_weekly_summary(user_id: str, agent: SlugPilotAgent = Depends(get_agent)):
     """Send weekly summary notification"""
     if not agent.weekly_plan:
-        agent.create_weekly_plan()
+        await agent.create_weekly_plan()
     
-    health = agent.check_academic_health()
+    health = await agent.check_academic_health()
     notification_service = NotificationService(agent.user)
     
-    success = notification_service.send_weekly_summary(agent.weekly_plan, health)
+    success = await notification_service.send_weekly_summary(agent.weekly_plan, health)
     
     return {
         "sent": success,
@@ -319,25 +383,47 @@ def send_weekly_summary(user_id: str, agent: SlugPilotAgent = Depends(get_agent)
 
 # Canvas Integration Endpoints
 @app.get("/users/{user_id}/canvas/deadlines", response_model=List[Deadline])
-def get_canvas_deadlines(user_id: str, days_ahead: int = 30, agent: SlugPilotAgent = Depends(get_agent)):
-    """Get deadlines from Canvas"""
+async def get_canvas_deadlines(
+    user_id: str,
+    days_ahead: int = 30,
+    limit: Optional[int] = Query(None, ge=1),
+    agent: SlugPilotAgent = Depends(get_agent)
+):
+    """Get deadlines from Canvas (?limit=N for the soonest N)"""
     if not agent.canvas_service:
         raise HTTPException(status_code=400, detail="Canvas service not configured")
     
-    deadlines = agent.canvas_service.get_deadlines(days_ahead=days_ahead)
-    return deadlines
+    deadlines = await asyncio.to_thread(agent.canvas_service.get_deadlines, days_ahead=days_ahead)
+    # get_deadlines is already sorted by due date, so the soonest N are a prefix
+    return deadlines if limit is None else deadlines[:limit]
 
 
 @app.get("/users/{user_id}/canvas/courses")
-def get_canvas_courses(user_id: str, agent: SlugPilotAgent = Depends(get_agent)):
+async def get_canvas_courses(user_id: str, agent: SlugPilotAgent = Depends(get_agent)):
     """Get enrolled courses from Canvas"""
     if not agent.canvas_service:
         raise HTTPException(status_code=400, detail="Canvas service not configured")
     
-    courses = agent.canvas_service.get_courses()
+    courses = await asyncio.to_thread(agent.canvas_service.get_courses)
     return {"courses": courses}
 
 
+@app.post("/users/{user_id}/canvas/webhook")
+async def canvas_webhook(user_id: str, agent: SlugPilotAgent = Depends(get_agent)):
+    """Called by Canvas when a user's assignments change"""
+    agent_loop = agent_manager.get_agent_loop(user_id)
+    if agent_loop:
+        agent_loop.invalidate_canvas()
+        # Wake the autonomous agent so it reacts to the change right away
+        # (or right after its current cycle, which may have read stale data)
+        agent_manager.poke_agent(user_id)
+    else:
+        agent.canvas_service.invalidate_deadlines()
+        agent.invalidate_cache()
+    
+    return {"status": "received", "user_id": user_id}
+
+
 # Agent Control Endpoints (Autonomous Agent Management)
 @app.post("/users/{user_id}/agent/start")
 async def start_agent(user_id: str):
@@ -387,8 +473,8 @@ def get_agent_status(user_id: str):
 
 
 @app.get("/users/{user_id}/agent/actions")
-def get_agent_actions(user_id: str, limit: int = 20):
-    """Get recent actions taken by the autonomous agent"""
+async def get_agent_actions(user_id: str, limit: int = Query(20, ge=1), offset: int = Query(0, ge=0)):
+    """Get recent actions taken by the autonomous agent (page back with ?offset=N)"""
     if user_id not in users_db:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -396,11 +482,13 @@ def get_agent_actions(user_id: str, limit: int = 20):
     if not agent_loop:
         return {"actions": []}
     
-    actions = agent_loop.get_action_history(limit=limit)
-    return {
+    actions = agent_loop.get_action_history(limit=limit, offset=offset)
+    # Action timestamps are datetimes; orjson serializes them natively
+    return ORJSONResponse({
         "actions": actions,
-        "count": len(actions)
-    }
+        "count": len(actions),
+        "total": len(agent_loop.action_history)
+    })
 
 
 @app.post("/users/{user_id}/agent/execute-cycle")
@@ -413,18 +501,30 @@ async def execute_agent_cycle(user_id: str):
     if not agent_loop:
         raise HTTPException(status_code=404, detail="Agent not registered")
     
-    await agent_loop._run_cycle()
-    return {
+    if not await agent_manager.run_cycle(user_id):
+        raise HTTPException(status_code=409, detail="An agent cycle is already running")
+    return ORJSONResponse({
         "status": "completed",
         "message": "Agent cycle executed",
         "actions": agent_loop.get_action_history(limit=5)
+    })
+
+
+@app.post("/agents/execute-cycles")
+async def execute_all_agent_cycles():
+    """Run one cycle for every registered agent (for batch/cron use)"""
+    results = await agent_manager.run_cycles()
+    return {
+        "status": "completed",
+        "results": results,
+        "count": len(results)
     }
 
 
 @app.get("/users/{user_id}/agent/decisions")
-def get_autonomous_decisions(user_id: str, agent: SlugPilotAgent = Depends(get_agent)):
+async def get_autonomous_decisions(user_id: str, agent: SlugPilotAgent = Depends(get_agent)):
     """Get recent autonomous decisions made by the agent"""
-    decisions = agent.make_autonomous_decisions()
+    decisions = await agent.make_autonomous_decisions()
     return {
         "decisions": decisions,
         "count": len(decisions),
@@ -432,6 +532,14 @@ def get_autonomous_decisions(user_id: str, agent: SlugPilotAgent = Depends(get_a
     }
 
 
+@app.get("/users/{user_id}/agent/state")
+async def get_agent_state(user_id: str, agent: SlugPilotAgent = Depends(get_agent)):
+    """Get plan, health, nudge status, questions and decisions in one call"""
+    state = await agent.compute_full_state()
+    state["timestamp"] = datetime.now().isoformat()
+    return state
+
+
 # Health Check
 @app.get("/")
 def health():
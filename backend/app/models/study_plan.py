@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import List, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 
 
 class StudySession(BaseModel):
@@ -45,4 +45,15 @@ class StudyPlan(BaseModel):
                 "status": "active"
             }
         }
+    
+    def calendar_sessions(self) -> List[dict]:
+        """Sessions as JSON-ready dicts for CalendarService.sync_study_sessions"""
+        return _SESSIONS_ADAPTER.dump_python(
+            self.sessions, mode="json", include={"__all__": _CALENDAR_SYNC_FIELDS}
+        )
+
+
+# Fields the calendar sync reads; dumped in one pass over the whole session list
+_CALENDAR_SYNC_FIELDS = {"course", "topic", "duration_hours", "scheduled_time", "materials"}
+_SESSIONS_ADAPTER = TypeAdapter(List[StudySession])
 
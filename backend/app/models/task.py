@@ -1,7 +1,8 @@
-from datetime import datetime
+from datetime import date, datetime
 from enum import Enum
-from typing import Optional
-from pydantic import BaseModel, Field
+from typing import Optional, Tuple
+from pydantic import BaseModel, Field, PrivateAttr
+from app.utils.dates import epoch_seconds
 
 
 class TaskPriority(str, Enum):
@@ -31,6 +32,29 @@ class Task(BaseModel):
     created_at: datetime = Field(default_factory=datetime.now)
     updated_at: datetime = Field(default_factory=datetime.now)
     
+    # Cached epoch seconds for due_date, recomputed when due_date is reassigned
+    _due_ts: Optional[float] = PrivateAttr(default=None)
+    _due_ts_src: Optional[datetime] = PrivateAttr(default=None)
+    
+    # Cached (casefolded title, due day) used to drop duplicates across sources
+    _dedupe_key: Optional[Tuple[str, date]] = PrivateAttr(default=None)
+    _dedupe_src: Optional[Tuple[str, datetime]] = PrivateAttr(default=None)
+    
+    def due_timestamp(self) -> float:
+        """Due date as epoch seconds (see app.utils.dates.epoch_seconds)"""
+        if self._due_ts_src is not self.due_date:
+            self._due_ts = epoch_seconds(self.due_date)
+            self._due_ts_src = self.due_date
+        return self._due_ts
+    
+    def dedupe_key(self) -> Tuple[str, date]:
+        """Identity of a task across sources: title (case-insensitive) and due day"""
+        src = self._dedupe_src
+        if src is None or src[0] is not self.title or src[1] is not self.due_date:
+            self._dedupe_key = (self.title.casefold(), self.due_date.date())
+            self._dedupe_src = (self.title, self.due_date)
+        return self._dedupe_key
+    
     class Config:
         json_schema_extra = {
             "example": {
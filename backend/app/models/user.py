@@ -1,6 +1,18 @@
+from datetime import time
+from functools import lru_cache
 from typing import Optional, List
 from pydantic import BaseModel, Field
 
+# Study sessions start at this time when no preferred slot is set
+DEFAULT_STUDY_START = time(10, 0)
+
+
+@lru_cache(maxsize=256)
+def _parse_slot_start(slot: str) -> time:
+    """Start of a "HH:MM-HH:MM" slot; cached since the same slots are parsed per session"""
+    hour, minute = map(int, slot.split("-")[0].split(":"))
+    return time(hour, minute)
+
 
 class UserPreferences(BaseModel):
     notification_frequency: str = "daily"  # real-time, hourly, daily, weekly
@@ -9,6 +21,13 @@ class UserPreferences(BaseModel):
     preferred_study_times: List[str] = Field(default_factory=lambda: ["09:00-12:00", "14:00-17:00"])
     auto_create_study_plans: bool = True
     study_plan_days_before_exam: int = 7
+    plan_cache_enabled: bool = True  # Reuse study plan layouts for repeated requests
+    
+    def preferred_start_time(self) -> time:
+        """Start time of the first preferred study slot"""
+        if self.preferred_study_times:
+            return _parse_slot_start(self.preferred_study_times[0])
+        return DEFAULT_STUDY_START
     
     class Config:
         json_schema_extra = {
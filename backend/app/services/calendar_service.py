@@ -1,10 +1,26 @@
 from typing import List, Optional
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from app.models.task import Task, TaskPriority
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
+from google_auth_httplib2 import AuthorizedHttp
+import httplib2
 import json
+import re
+import threading
+from app.utils.cache import ttl_cache
+from app.utils.dates import parse_iso_local
+
+# Event summaries containing any of these are treated as deadlines
+DEADLINE_KEYWORDS = frozenset({'due', 'deadline', 'assignment', 'homework', 'project', 'exam'})
+_DEADLINE_RE = re.compile('|'.join(sorted(DEADLINE_KEYWORDS)), re.IGNORECASE)
+_DUE_RE = re.compile('due', re.IGNORECASE)
+
+# Google Calendar accepts at most 50 calls per batch request
+MAX_BATCH_SIZE = 50
+
+# Upcoming events are reused for this long; creating events invalidates them
+EVENTS_CACHE_TTL_SECONDS = 60
 
 
 class CalendarService:
@@ -13,61 +29,93 @@ class CalendarService:
     def __init__(self, google_credentials: Optional[dict] = None, apple_calendar_enabled: bool = False):
         self.google_credentials = google_credentials
         self.apple_calendar_enabled = apple_calendar_enabled
-        self.service = None
-        
-        if google_credentials:
-            self._initialize_google_calendar()
+        self._service = None
+        self._service_initialized = False
+        self._init_lock = threading.Lock()
+        self._credentials = None
+        # httplib2 connections are not thread-safe, so each worker thread gets its own
+        self._local = threading.local()
+    
+    @property
+    def service(self):
+        """Google Calendar API service, built on first use"""
+        if not self._service_initialized:
+            with self._init_lock:
+                if not self._service_initialized:
+                    if self.google_credentials:
+                        self._initialize_google_calendar()
+                    self._service_initialized = True
+        return self._service
+    
+    @service.setter
+    def service(self, value):
+        self._service = value
+        self._service_initialized = True
     
     def _initialize_google_calendar(self):
         """Initialize Google Calendar API service"""
+        # Imported here so users without a calendar never load the API client
+        from googleapiclient.discovery import build
+        
         try:
             creds = Credentials.from_authorized_user_info(self.google_credentials)
-            self.service = build('calendar', 'v3', credentials=creds)
+            self._credentials = creds
+            # Use the discovery document bundled with the client instead of fetching it
+            self._service = build('calendar', 'v3', credentials=creds,
+                                  static_discovery=True, cache_discovery=False)
         except Exception as e:
             print(f"Error initializing Google Calendar: {e}")
-            self.service = None
+            self._service = None
+    
+    def _http(self) -> AuthorizedHttp:
+        """Authorized HTTP client for the calling thread"""
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = AuthorizedHttp(self._credentials, http=httplib2.Http())
+            self._local.http = http
+        return http
     
+    @ttl_cache(EVENTS_CACHE_TTL_SECONDS)
     def get_upcoming_events(self, days_ahead: int = 30) -> List[dict]:
         """Fetch upcoming events from Google Calendar"""
         if not self.service:
             return []
         
         try:
-            now = datetime.utcnow().isoformat() + 'Z'
-            time_max = (datetime.utcnow() + timedelta(days=days_ahead)).isoformat() + 'Z'
+            # Aware UTC isoformat ("+00:00" offset) is valid RFC 3339 for the API
+            now = datetime.now(timezone.utc)
+            time_max = now + timedelta(days=days_ahead)
             
             events_result = self.service.events().list(
                 calendarId='primary',
-                timeMin=now,
-                timeMax=time_max,
+                timeMin=now.isoformat(),
+                timeMax=time_max.isoformat(),
                 maxResults=100,
                 singleEvents=True,
                 orderBy='startTime'
-            ).execute()
+            ).execute(http=self._http())
             
             return events_result.get('items', [])
         except Exception as e:
             print(f"Error fetching calendar events: {e}")
             return []
     
-    def get_tasks_from_calendar(self) -> List[Task]:
+    def get_tasks_from_calendar(self, now: Optional[datetime] = None) -> List[Task]:
         """Convert calendar events to tasks"""
         events = self.get_upcoming_events()
         tasks = []
+        now = now or datetime.now()
         
         for event in events:
             start = event.get('start', {}).get('dateTime') or event.get('start', {}).get('date')
             if not start:
                 continue
             
-            # Parse datetime
-            if 'T' in start:
-                start_dt = datetime.fromisoformat(start.replace('Z', '+00:00'))
-            else:
-                start_dt = datetime.fromisoformat(start)
+            # Handles all-day dates, a trailing 'Z' and offset-aware event times alike
+            start_dt = parse_iso_local(start)
             
             # Skip past events
-            if start_dt < datetime.now():
+            if start_dt < now:
                 continue
             
             # Determine if it's a deadline or event
@@ -75,19 +123,22 @@ class CalendarService:
             description = event.get('description', '')
             
             # Check if it looks like a deadline/assignment
-            is_deadline = any(keyword in summary.lower() for keyword in 
-                            ['due', 'deadline', 'assignment', 'homework', 'project', 'exam'])
+            is_deadline = _DEADLINE_RE.search(summary) is not None
             
-            if is_deadline or 'due' in description.lower():
+            if is_deadline or _DUE_RE.search(description):
                 priority = TaskPriority.HIGH if is_deadline else TaskPriority.MEDIUM
                 
-                task = Task(
+                # Values are already typed, so skip pydantic validation
+                task = Task.model_construct(
                     title=summary,
                     description=description,
                     due_date=start_dt,
                     priority=priority,
                     source="calendar",
-                    estimated_hours=1.0  # Default for calendar events
+                    id=f"calendar:{event['id']}" if event.get('id') else None,
+                    estimated_hours=1.0,  # Default for calendar events
+                    created_at=now,
+                    updated_at=now
                 )
                 tasks.append(task)
         
@@ -100,45 +151,73 @@ class CalendarService:
             return None
         
         try:
-            event = {
-                'summary': title,
-                'description': description or '',
-                'start': {
-                    'dateTime': start_time.isoformat(),
-                    'timeZone': 'America/Los_Angeles',
-                },
-                'end': {
-                    'dateTime': end_time.isoformat(),
-                    'timeZone': 'America/Los_Angeles',
-                },
-            }
-            
             created_event = self.service.events().insert(
                 calendarId='primary',
-                body=event
-            ).execute()
+                body=self._event_body(title, start_time, end_time, description)
+            ).execute(http=self._http())
             
+            self.invalidate_events()
             return created_event
         except Exception as e:
             print(f"Error creating calendar event: {e}")
             return None
     
+    def _event_body(self, title: str, start_time: datetime, end_time: datetime,
+                    description: Optional[str] = None) -> dict:
+        """Google Calendar event resource"""
+        return {
+            'summary': title,
+            'description': description or '',
+            'start': {
+                'dateTime': start_time.isoformat(),
+                'timeZone': 'America/Los_Angeles',
+            },
+            'end': {
+                'dateTime': end_time.isoformat(),
+                'timeZone': 'America/Los_Angeles',
+            },
+        }
+    
     def sync_study_sessions(self, study_sessions: List[dict]) -> List[dict]:
-        """Sync study sessions to calendar"""
+        """Sync study sessions to calendar, batching the inserts into as few requests as possible"""
+        if not self.service:
+            return []
+        
         created_events = []
-        for session in study_sessions:
-            start_time = datetime.fromisoformat(session['scheduled_time'])
-            end_time = start_time + timedelta(hours=session['duration_hours'])
-            
-            event = self.create_event(
-                title=f"Study: {session['course']} - {session['topic']}",
-                start_time=start_time,
-                end_time=end_time,
-                description=f"Materials: {', '.join(session.get('materials', []))}"
-            )
+        
+        def on_insert(request_id, response, exception):
+            # Batch callbacks run in the order the requests were added
+            if exception is not None:
+                print(f"Error creating calendar event: {exception}")
+            else:
+                created_events.append(response)
+        
+        for i in range(0, len(study_sessions), MAX_BATCH_SIZE):
+            batch = self.service.new_batch_http_request(callback=on_insert)
+            for session in study_sessions[i:i + MAX_BATCH_SIZE]:
+                start_time = datetime.fromisoformat(session['scheduled_time'])
+                end_time = start_time + timedelta(hours=session['duration_hours'])
+                
+                batch.add(self.service.events().insert(
+                    calendarId='primary',
+                    body=self._event_body(
+                        title=f"Study: {session['course']} - {session['topic']}",
+                        start_time=start_time,
+                        end_time=end_time,
+                        description=f"Materials: {', '.join(session.get('materials', []))}"
+                    )
+                ))
             
-            if event:
-                created_events.append(event)
+            try:
+                batch.execute(http=self._http())
+            except Exception as e:
+                print(f"Error syncing study sessions: {e}")
         
+        if created_events:
+            self.invalidate_events()
         return created_events
+    
+    def invalidate_events(self):
+        """Drop cached upcoming events so the next call re-fetches from Google"""
+        CalendarService.get_upcoming_events.cache_clear(self)
 
@@ -1,8 +1,85 @@
-import requests
-from typing import List, Optional
-from datetime import datetime
+import orjson
+import re
+import time
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from operator import attrgetter
+from types import MappingProxyType
+from typing import List, Optional, Tuple
+from datetime import datetime, timedelta
 from app.models.deadline import Deadline
 from app.models.task import Task, TaskPriority
+from app.utils.cache import SharedTTLCache, ttl_cache
+from app.utils.dates import parse_iso_local
+from app.utils.http import DEFAULT_TIMEOUT, pooled_session
+
+# Deadlines are refreshed when Canvas calls the webhook; this TTL is only the fallback
+DEADLINE_CACHE_TTL_SECONDS = 3600
+
+# Per-course assignment requests run in parallel on this pool, shared by all users
+COURSE_FETCH_WORKERS = 10
+_COURSE_EXECUTOR = ThreadPoolExecutor(max_workers=COURSE_FETCH_WORKERS, thread_name_prefix="canvas-course")
+
+# Raw Canvas responses, shared process-wide and keyed by (base_url, token[, course]).
+# Enrollment rarely changes; assignments change on the order of hours. A
+# Cache-Control max-age on the response overrides these defaults.
+COURSES_CACHE_TTL_SECONDS = 3600
+ASSIGNMENTS_CACHE_TTL_SECONDS = 300
+_courses_cache = SharedTTLCache(COURSES_CACHE_TTL_SECONDS, maxsize=128)
+_assignments_cache = SharedTTLCache(ASSIGNMENTS_CACHE_TTL_SECONDS, maxsize=1024)
+
+# Canvas throttles each token with a leaky bucket (~700 units) and reports what is
+# left in X-Rate-Limit-Remaining. Below the low-water mark a fetch pauses before its
+# next request so the bucket can drain instead of the fan-out tripping 403s.
+RATE_LIMIT_LOW_WATER = 200
+RATE_LIMIT_PAUSE_SECONDS = 1.0
+
+# Canvas pages list endpoints (10 items by default); ask for the max page size
+CANVAS_PAGE_SIZE = 100
+
+# Priority by whole days until due: <= 1 critical, <= 3 high, <= 7 medium, else low.
+# (due - now).days <= n is the same as due < now + (n + 1) days, so each deadline
+# is bucketed by bisecting these day offsets (as absolute cutoffs) once.
+PRIORITY_CUTOFF_DAYS = (2, 4, 8)
+PRIORITY_BY_BUCKET = (TaskPriority.CRITICAL, TaskPriority.HIGH, TaskPriority.MEDIUM, TaskPriority.LOW)
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+# Mock deadlines are numbered "mock_<n>" per call, so the id names no real assignment
+_MOCK_ASSIGNMENT_PREFIX = "mock_"
+
+
+def _response_ttl(response) -> Optional[float]:
+    """TTL from the response's Cache-Control max-age, if it sets one"""
+    match = _MAX_AGE_RE.search(response.headers.get("Cache-Control", ""))
+    return float(match.group(1)) if match else None
+
+
+def _throttle(response):
+    """Back off briefly when Canvas says this token's rate-limit bucket is nearly full"""
+    remaining = response.headers.get("X-Rate-Limit-Remaining")
+    if remaining is not None and float(remaining) < RATE_LIMIT_LOW_WATER:
+        time.sleep(RATE_LIMIT_PAUSE_SECONDS)
+
+
+# Read-only so the shared table can't be mutated through a caller
+_BASE_HOURS = MappingProxyType({
+    "homework": 3.0,
+    "assignment": 4.0,
+    "project": 10.0,
+    "exam": 0.0,  # Exams don't need prep time in task form
+    "quiz": 1.0,
+})
+# Multiplier indexed by the points bucket (False/True: over 50 points)
+_POINTS_MULTIPLIER = (1.0, 1.5)
+
+
+@lru_cache(maxsize=64)
+def _estimate_hours_for(assignment_type: Optional[str], high_points: bool) -> float:
+    """Hours for an assignment type (raw Canvas value), scaled up for >50-point work"""
+    base = _BASE_HOURS.get((assignment_type or "assignment").lower(), 3.0)
+    return base * _POINTS_MULTIPLIER[high_points]
 
 
 class CanvasService:
@@ -18,48 +95,83 @@ class CanvasService:
             }
         else:
             self.headers = {}
+        # One keep-alive pool per service, sized for the per-course fan-out
+        self.session = pooled_session(COURSE_FETCH_WORKERS, self.headers)
+    
+    def _get_all_pages(self, url: str, params: dict) -> Tuple[List[dict], Optional[float]]:
+        """GET a Canvas list endpoint, following Link rel="next" until exhausted"""
+        response = self.session.get(
+            url, params={**params, "per_page": CANVAS_PAGE_SIZE}, timeout=DEFAULT_TIMEOUT
+        )
+        response.raise_for_status()
+        ttl = _response_ttl(response)
+        # orjson parses the (often large, description-heavy) payloads much faster than stdlib json
+        items = orjson.loads(response.content)
+        
+        # The next link already carries the query string (including per_page)
+        while "next" in response.links:
+            _throttle(response)
+            response = self.session.get(response.links["next"]["url"], timeout=DEFAULT_TIMEOUT)
+            response.raise_for_status()
+            items.extend(orjson.loads(response.content))
+        
+        # Also pace the next fetch this thread picks up from the course fan-out
+        _throttle(response)
+        return items, ttl
     
     def get_courses(self) -> List[dict]:
         """Fetch all enrolled courses"""
+        cache_key = (self.base_url, self.api_token)
+        cached = _courses_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
-            response = requests.get(
-                f"{self.base_url}/courses",
-                headers=self.headers,
-                params={"enrollment_state": "active"}
+            courses, ttl = self._get_all_pages(
+                f"{self.base_url}/courses", {"enrollment_state": "active"}
             )
-            response.raise_for_status()
-            return response.json()
+            _courses_cache.set(cache_key, courses, ttl)
+            return courses
         except Exception as e:
             print(f"Error fetching courses: {e}")
             return []
     
     def get_assignments(self, course_id: Optional[str] = None) -> List[dict]:
         """Fetch assignments from all courses or a specific course"""
-        assignments = []
-        
         if course_id:
             courses = [{"id": course_id}]
         else:
             courses = self.get_courses()
         
-        for course in courses:
-            try:
-                response = requests.get(
-                    f"{self.base_url}/courses/{course['id']}/assignments",
-                    headers=self.headers,
-                    params={"bucket": "upcoming"}
-                )
-                response.raise_for_status()
-                course_assignments = response.json()
-                for assignment in course_assignments:
-                    assignment["course_name"] = course.get("name", "Unknown")
-                assignments.extend(course_assignments)
-            except Exception as e:
-                print(f"Error fetching assignments for course {course.get('id')}: {e}")
-                continue
+        if len(courses) == 1:
+            return self._get_course_assignments(courses[0])
         
+        # One request per course, issued concurrently; map() keeps course order
+        assignments = []
+        for course_assignments in _COURSE_EXECUTOR.map(self._get_course_assignments, courses):
+            assignments.extend(course_assignments)
         return assignments
     
+    def _get_course_assignments(self, course: dict) -> List[dict]:
+        """Fetch upcoming assignments for a single course"""
+        cache_key = (self.base_url, self.api_token, course["id"])
+        cached = _assignments_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        try:
+            course_assignments, ttl = self._get_all_pages(
+                f"{self.base_url}/courses/{course['id']}/assignments", {"bucket": "upcoming"}
+            )
+            for assignment in course_assignments:
+                assignment["course_name"] = course.get("name", "Unknown")
+            _assignments_cache.set(cache_key, course_assignments, ttl)
+            return course_assignments
+        except Exception as e:
+            print(f"Error fetching assignments for course {course.get('id')}: {e}")
+            return []
+    
+    @ttl_cache(DEADLINE_CACHE_TTL_SECONDS)
     def get_deadlines(self, days_ahead: int = 30) -> List[Deadline]:
         """Convert Canvas assignments to Deadline objects"""
         assignments = self.get_assignments()
@@ -75,7 +187,7 @@ class CanvasService:
         
         for assignment in assignments:
             if assignment.get("due_at"):
-                due_date = datetime.fromisoformat(assignment["due_at"].replace("Z", "+00:00"))
+                due_date = parse_iso_local(assignment["due_at"])
                 
                 deadline = Deadline(
                     title=assignment.get("name", "Untitled Assignment"),
@@ -88,59 +200,57 @@ class CanvasService:
                 )
                 deadlines.append(deadline)
         
-        return sorted(deadlines, key=lambda d: d.due_date)
+        return sorted(deadlines, key=attrgetter("due_date"))
+    
+    def invalidate_deadlines(self):
+        """Drop cached deadlines so the next call re-fetches from Canvas"""
+        CanvasService.get_deadlines.cache_clear(self)
+        # Assignments changed; the course list is still valid and tells us which keys to drop
+        for course in _courses_cache.get((self.base_url, self.api_token)) or []:
+            _assignments_cache.discard((self.base_url, self.api_token, course["id"]))
     
-    def get_tasks_from_deadlines(self, deadlines: Optional[List[Deadline]] = None) -> List[Task]:
+    def get_tasks_from_deadlines(
+        self,
+        deadlines: Optional[List[Deadline]] = None,
+        now: Optional[datetime] = None
+    ) -> List[Task]:
         """Convert deadlines to tasks"""
         if deadlines is None:
             deadlines = self.get_deadlines()
         
+        now = now or datetime.now()
+        cutoffs = [now + timedelta(days=days) for days in PRIORITY_CUTOFF_DAYS]
+        
         tasks = []
         for deadline in deadlines:
-            # Determine priority based on days until due date
-            days_until_due = (deadline.due_date - datetime.now()).days
-            
-            if days_until_due <= 1:
-                priority = TaskPriority.CRITICAL
-            elif days_until_due <= 3:
-                priority = TaskPriority.HIGH
-            elif days_until_due <= 7:
-                priority = TaskPriority.MEDIUM
-            else:
-                priority = TaskPriority.LOW
+            priority = PRIORITY_BY_BUCKET[bisect_right(cutoffs, deadline.due_date)]
             
-            task = Task(
+            # Built from an already-validated Deadline, so skip re-validating the same values
+            task = Task.model_construct(
                 title=deadline.title,
                 description=deadline.description,
                 course=deadline.course,
                 due_date=deadline.due_date,
                 priority=priority,
                 source="canvas",
-                estimated_hours=self._estimate_hours(deadline)
+                id=self._task_id(deadline),
+                estimated_hours=self._estimate_hours(deadline),
+                created_at=now,
+                updated_at=now
             )
             tasks.append(task)
         
         return tasks
     
+    def _task_id(self, deadline: Deadline) -> Optional[str]:
+        """Stable task id for a real Canvas assignment, None for mock deadlines"""
+        assignment_id = deadline.canvas_assignment_id
+        if not assignment_id or assignment_id.startswith(_MOCK_ASSIGNMENT_PREFIX):
+            return None
+        return f"canvas:{assignment_id}"
+    
     def _estimate_hours(self, deadline: Deadline) -> float:
         """Estimate hours needed based on assignment type and points"""
-        base_hours = {
-            "homework": 3.0,
-            "assignment": 4.0,
-            "project": 10.0,
-            "exam": 0.0,  # Exams don't need prep time in task form
-            "quiz": 1.0,
-        }
-        
-        assignment_type = (deadline.assignment_type or "assignment").lower()
-        base = base_hours.get(assignment_type, 3.0)
-        
-        # Adjust based on points
-        if deadline.points:
-            if deadline.points > 50:
-                base *= 1.5
-            elif deadline.points > 100:
-                base *= 2.0
-        
-        return base
+        points = deadline.points
+        return _estimate_hours_for(deadline.assignment_type, bool(points) and points > 50)
 
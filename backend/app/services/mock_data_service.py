@@ -2,15 +2,29 @@
 Mock Data Service for Demo Purposes
 Generates realistic student data to demonstrate SlugPilot functionality
 """
+from bisect import bisect_right
 from datetime import datetime, timedelta
-from typing import List
+from operator import attrgetter
+from typing import List, Optional
+import heapq
 import random
 from app.models.deadline import Deadline
 from app.models.task import Task, TaskPriority, TaskStatus
+from app.services.canvas_service import PRIORITY_CUTOFF_DAYS, PRIORITY_BY_BUCKET
+
+
+_due_date = attrgetter("due_date")
 
 
 class MockDataService:
-    """Generates realistic mock data for demo purposes"""
+    """
+    Generates realistic mock data for demo purposes.
+    
+    Every field is produced here with the right type, so models are built
+    with model_construct and skip pydantic validation. Due dates are offsets
+    from base_date; created_at/updated_at are stamped with one `now` per call
+    rather than a datetime.now() per object through the field defaults.
+    """
     
     COURSES = [
         "CS101 - Introduction to Computer Science",
@@ -27,17 +41,22 @@ class MockDataService:
     def __init__(self):
         self.base_date = datetime.now()
     
-    def generate_canvas_deadlines(self, num_assignments: int = 10) -> List[Deadline]:
+    def generate_canvas_deadlines(self, num_assignments: int = 10, now: Optional[datetime] = None) -> List[Deadline]:
         """Generate realistic Canvas deadlines"""
+        now = now or datetime.now()
         deadlines = []
         
-        for i in range(num_assignments):
-            course = random.choice(self.COURSES)
-            assignment_type = random.choice(self.ASSIGNMENT_TYPES)
-            
-            # Vary due dates - some past, some upcoming
-            days_offset = random.randint(-5, 14)  # -5 to +14 days
-            due_date = self.base_date + timedelta(days=days_offset, hours=random.randint(9, 23))
+        # Draw the per-assignment fields in bulk rather than a few RNG calls per item
+        samples = zip(
+            random.choices(self.COURSES, k=num_assignments),
+            random.choices(self.ASSIGNMENT_TYPES, k=num_assignments),
+            # Vary due dates - some past, some upcoming (-5 to +14 days)
+            random.choices(range(-5, 15), k=num_assignments),
+            random.choices(range(9, 24), k=num_assignments)
+        )
+        
+        for i, (course, assignment_type, days_offset, hours_offset) in enumerate(samples):
+            due_date = self.base_date + timedelta(days=days_offset, hours=hours_offset)
             
             # Generate realistic assignment names
             if assignment_type == "homework":
@@ -59,21 +78,23 @@ class MockDataService:
             else:
                 points = random.choice([10.0, 15.0, 20.0, 25.0])
             
-            deadline = Deadline(
+            deadline = Deadline.model_construct(
                 title=title,
                 course=course,
                 due_date=due_date,
                 assignment_type=assignment_type,
                 points=points,
                 description=f"Complete {title} for {course}",
-                canvas_assignment_id=f"mock_{i}"
+                canvas_assignment_id=f"mock_{i}",
+                created_at=now
             )
             deadlines.append(deadline)
         
-        return sorted(deadlines, key=lambda d: d.due_date)
+        return sorted(deadlines, key=_due_date)
     
-    def generate_calendar_events(self, num_events: int = 5) -> List[Task]:
+    def generate_calendar_events(self, num_events: int = 5, now: Optional[datetime] = None) -> List[Task]:
         """Generate realistic calendar events that are deadlines"""
+        now = now or datetime.now()
         tasks = []
         
         event_types = [
@@ -83,27 +104,33 @@ class MockDataService:
             ("Review Session", "Exam review session"),
         ]
         
-        for i in range(num_events):
-            event_name, description = random.choice(event_types)
-            course = random.choice(self.COURSES)
-            days_offset = random.randint(0, 7)
-            event_time = self.base_date + timedelta(days=days_offset, hours=random.randint(9, 17))
+        events = zip(
+            random.choices(event_types, k=num_events),
+            random.choices(self.COURSES, k=num_events),
+            random.choices(range(0, 8), k=num_events),
+            random.choices(range(9, 18), k=num_events)
+        )
+        for (event_name, description), course, days_offset, hours_offset in events:
+            event_time = self.base_date + timedelta(days=days_offset, hours=hours_offset)
             
-            task = Task(
+            task = Task.model_construct(
                 title=f"{event_name}: {course}",
                 description=description,
                 course=course,
                 due_date=event_time,
                 priority=TaskPriority.MEDIUM,
                 source="calendar",
-                estimated_hours=1.0
+                estimated_hours=1.0,
+                created_at=now,
+                updated_at=now
             )
             tasks.append(task)
         
         return tasks
     
-    def generate_piazza_announcements(self) -> List[Task]:
+    def generate_piazza_announcements(self, now: Optional[datetime] = None) -> List[Task]:
         """Generate Piazza-style announcements with deadlines"""
+        now = now or datetime.now()
         tasks = []
         
         announcements = [
@@ -119,20 +146,23 @@ class MockDataService:
             days_offset = random.randint(1, 5)
             due_date = self.base_date + timedelta(days=days_offset)
             
-            task = Task(
+            task = Task.model_construct(
                 title=f"Piazza: {title}",
                 description=content,
                 course=course,
                 due_date=due_date,
                 priority=TaskPriority.MEDIUM,
-                source="piazza"
+                source="piazza",
+                created_at=now,
+                updated_at=now
             )
             tasks.append(task)
         
         return tasks
     
-    def generate_slack_messages(self) -> List[Task]:
+    def generate_slack_messages(self, now: Optional[datetime] = None) -> List[Task]:
         """Generate Slack-style messages with deadlines"""
+        now = now or datetime.now()
         tasks = []
         
         messages = [
@@ -146,46 +176,43 @@ class MockDataService:
             days_offset = random.randint(1, 3)
             due_date = self.base_date + timedelta(days=days_offset, hours=23, minutes=59)
             
-            task = Task(
+            task = Task.model_construct(
                 title=f"Slack: {title}",
                 description=content,
                 course=course,
                 due_date=due_date,
                 priority=TaskPriority.HIGH,
-                source="slack"
+                source="slack",
+                created_at=now,
+                updated_at=now
             )
             tasks.append(task)
         
         return tasks
     
-    def get_all_mock_tasks(self) -> List[Task]:
-        """Get all mock tasks from all sources"""
+    def get_all_mock_tasks(self, limit: Optional[int] = None, now: Optional[datetime] = None) -> List[Task]:
+        """Get all mock tasks from all sources (only the `limit` soonest, if given)"""
+        # One creation timestamp for the whole batch, shared with every generator
+        now = now or datetime.now()
         all_tasks = []
         
         # Convert deadlines to tasks
-        deadlines = self.generate_canvas_deadlines(10)
+        deadlines = self.generate_canvas_deadlines(10, now)
+        # Same buckets as CanvasService.get_tasks_from_deadlines, plus bucket 0 for overdue
+        cutoffs = [self.base_date] + [self.base_date + timedelta(days=days) for days in PRIORITY_CUTOFF_DAYS]
+        
         for deadline in deadlines:
-            days_until = (deadline.due_date - self.base_date).days
-            
-            if days_until < 0:
+            bucket = bisect_right(cutoffs, deadline.due_date)
+            if bucket == 0:
                 priority = TaskPriority.CRITICAL
                 status = TaskStatus.OVERDUE
-            elif days_until <= 1:
-                priority = TaskPriority.CRITICAL
-                status = TaskStatus.PENDING
-            elif days_until <= 3:
-                priority = TaskPriority.HIGH
-                status = TaskStatus.PENDING
-            elif days_until <= 7:
-                priority = TaskPriority.MEDIUM
-                status = TaskStatus.PENDING
             else:
-                priority = TaskPriority.LOW
+                priority = PRIORITY_BY_BUCKET[bucket - 1]
                 status = TaskStatus.PENDING
             
             # Estimate hours
             if deadline.assignment_type in ["midterm", "exam", "final"]:
-                estimated_hours = 0  # Exams don't need prep time in task form
+                estimated_hours = 0.0  # Exams don't need prep time in task form
             elif deadline.assignment_type == "project":
                 estimated_hours = random.choice([8.0, 10.0, 12.0])
             elif deadline.assignment_type == "homework":
@@ -193,7 +220,7 @@ class MockDataService:
             else:
                 estimated_hours = random.choice([1.0, 2.0, 3.0])
             
-            task = Task(
+            task = Task.model_construct(
                 title=deadline.title,
                 description=deadline.description,
                 course=deadline.course,
@@ -201,20 +228,24 @@ class MockDataService:
                 priority=priority,
                 status=status,
                 source="canvas",
-                estimated_hours=estimated_hours
+                estimated_hours=estimated_hours,
+                created_at=now,
+                updated_at=now
             )
             all_tasks.append(task)
         
         # Add calendar events
-        all_tasks.extend(self.generate_calendar_events(5))
+        all_tasks.extend(self.generate_calendar_events(5, now))
         
         # Add Piazza announcements
-        all_tasks.extend(self.generate_piazza_announcements())
+        all_tasks.extend(self.generate_piazza_announcements(now))
         
         # Add Slack messages
-        all_tasks.extend(self.generate_slack_messages())
+        all_tasks.extend(self.generate_slack_messages(now))
         
-        return sorted(all_tasks, key=lambda t: t.due_date)
+        if limit is not None:
+            return heapq.nsmallest(limit, all_tasks, key=_due_date)
+        return sorted(all_tasks, key=_due_date)
 
 
 # Global instance
@@ -1,7 +1,12 @@
-import requests
+import re
 from typing import List, Optional
 from datetime import datetime, timedelta
 from app.models.task import Task, TaskPriority
+from app.utils.http import pooled_session
+
+# Announcements mentioning any of these (case-insensitive substring) become tasks
+DEADLINE_KEYWORDS = ('due', 'deadline', 'due date', 'submit by', 'extension')
+_DEADLINE_RE = re.compile('|'.join(map(re.escape, DEADLINE_KEYWORDS)), re.IGNORECASE)
 
 
 class PiazzaService:
@@ -12,7 +17,7 @@ class PiazzaService:
         self.password = password
         self.class_id = class_id
         self.base_url = "https://piazza.com/logic/api"
-        self.session = requests.Session()
+        self.session = pooled_session()
         self._authenticate()
     
     def _authenticate(self):
@@ -47,30 +52,30 @@ class PiazzaService:
         
         return announcements
     
-    def get_tasks_from_announcements(self) -> List[Task]:
+    def get_tasks_from_announcements(self, now: Optional[datetime] = None) -> List[Task]:
         """Convert Piazza announcements to tasks if they contain deadlines"""
         announcements = self.get_recent_announcements()
-        tasks = []
-        
-        deadline_keywords = ['due', 'deadline', 'due date', 'submit by', 'extension']
-        
-        for announcement in announcements:
-            content = (announcement.get('subject', '') + ' ' + 
-                      announcement.get('content', '')).lower()
-            
-            # Check if announcement mentions deadlines
-            if any(keyword in content for keyword in deadline_keywords):
-                # Try to extract date information
-                # In real implementation, use NLP/date parsing
-                task = Task(
-                    title=f"Check: {announcement.get('subject', 'Piazza Announcement')}",
-                    description=announcement.get('content', ''),
-                    course=announcement.get('course', 'Unknown'),
-                    due_date=datetime.now() + timedelta(days=1),  # Placeholder
-                    priority=TaskPriority.MEDIUM,
-                    source="piazza"
-                )
-                tasks.append(task)
+        now = now or datetime.now()
+        # Try to extract date information
+        # In real implementation, use NLP/date parsing
+        due_date = now + timedelta(days=1)  # Placeholder
         
-        return tasks
+        # Fields are plain strings we already hold, so skip pydantic validation
+        return [
+            Task.model_construct(
+                title=f"Check: {announcement.get('subject', 'Piazza Announcement')}",
+                description=announcement.get('content', ''),
+                course=announcement.get('course', 'Unknown'),
+                due_date=due_date,
+                priority=TaskPriority.MEDIUM,
+                source="piazza",
+                created_at=now,
+                updated_at=now
+            )
+            for announcement in announcements
+            # Only announcements that mention deadlines; the short subject is checked
+            # first so the (possibly long) body is scanned only when it doesn't match
+            if _DEADLINE_RE.search(announcement.get('subject', ''))
+            or _DEADLINE_RE.search(announcement.get('content', ''))
+        ]
 
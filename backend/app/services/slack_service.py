@@ -1,8 +1,29 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Optional
 from datetime import datetime, timedelta
 from app.models.task import Task, TaskPriority
 from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
+from slack_sdk.http_retry.builtin_handlers import RateLimitErrorRetryHandler
+from app.utils.cache import SharedTTLCache
+
+# Messages mentioning any of these (case-insensitive substring) become tasks
+DEADLINE_KEYWORDS = ('due', 'deadline', 'due date', 'submit', 'assignment', 'homework')
+_DEADLINE_RE = re.compile('|'.join(map(re.escape, DEADLINE_KEYWORDS)), re.IGNORECASE)
+
+# Channel history is shared by every user watching the same channel with the
+# same bot, so it is cached process-wide keyed by (token, channel, window)
+HISTORY_CACHE_TTL_SECONDS = 60
+_history_cache = SharedTTLCache(HISTORY_CACHE_TTL_SECONDS, maxsize=1024)
+
+# Channels are fetched in parallel on this pool, shared by all users
+CHANNEL_FETCH_WORKERS = 8
+
+# conversations.history page size (Slack recommends <= 200) and a cap on pages per channel
+HISTORY_PAGE_SIZE = 200
+MAX_HISTORY_PAGES = 10
+_CHANNEL_EXECUTOR = ThreadPoolExecutor(max_workers=CHANNEL_FETCH_WORKERS, thread_name_prefix="slack-channel")
 
 
 class SlackService:
@@ -12,55 +33,78 @@ class SlackService:
         self.bot_token = bot_token
         self.workspace = workspace
         self.client = WebClient(token=bot_token)
+        # Sleep for Retry-After and retry when Slack rate-limits us (HTTP 429)
+        self.client.retry_handlers.append(RateLimitErrorRetryHandler(max_retry_count=2))
     
     def get_recent_messages(self, channel_ids: List[str], hours: int = 24) -> List[dict]:
         """Fetch recent messages from specified Slack channels"""
         messages = []
         cutoff_time = (datetime.now() - timedelta(hours=hours)).timestamp()
         
-        for channel_id in channel_ids:
-            try:
+        def fetch(channel_id: str) -> List[dict]:
+            return self._get_channel_messages(channel_id, cutoff_time, hours)
+        
+        # Channels are independent, so fetch them concurrently; map() keeps channel order
+        fetched = map(fetch, channel_ids) if len(channel_ids) <= 1 else _CHANNEL_EXECUTOR.map(fetch, channel_ids)
+        for channel_messages in fetched:
+            messages.extend(channel_messages)
+        
+        return messages
+    
+    def _get_channel_messages(self, channel_id: str, cutoff_time: float, hours: int) -> List[dict]:
+        """Fetch (or reuse cached) recent messages for a single channel"""
+        cache_key = (self.bot_token, channel_id, hours)
+        cached = _history_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        try:
+            channel_messages = []
+            cursor = None
+            # Follow next_cursor so busy channels aren't truncated at one page
+            for _ in range(MAX_HISTORY_PAGES):
                 response = self.client.conversations_history(
                     channel=channel_id,
                     oldest=str(cutoff_time),
-                    limit=100
+                    limit=HISTORY_PAGE_SIZE,
+                    cursor=cursor
                 )
-                
-                for message in response.get('messages', []):
-                    message['channel_id'] = channel_id
-                    messages.append(message)
-            except SlackApiError as e:
-                print(f"Error fetching messages from channel {channel_id}: {e}")
-                continue
-        
-        return messages
+                channel_messages.extend(response.get('messages', []))
+                cursor = (response.get('response_metadata') or {}).get('next_cursor')
+                if not cursor:
+                    break
+            
+            for message in channel_messages:
+                message['channel_id'] = channel_id
+            _history_cache.set(cache_key, channel_messages)
+            return channel_messages
+        except SlackApiError as e:
+            print(f"Error fetching messages from channel {channel_id}: {e}")
+            return []
     
-    def get_tasks_from_messages(self, channel_ids: List[str]) -> List[Task]:
+    def get_tasks_from_messages(self, channel_ids: List[str], now: Optional[datetime] = None) -> List[Task]:
         """Convert Slack messages to tasks if they contain deadline information"""
         messages = self.get_recent_messages(channel_ids)
-        tasks = []
-        
-        deadline_keywords = ['due', 'deadline', 'due date', 'submit', 'assignment', 'homework']
+        now = now or datetime.now()
+        due_date = now + timedelta(days=2)  # Placeholder - would parse actual date
         
-        for message in messages:
-            text = message.get('text', '').lower()
-            
-            # Check if message mentions deadlines
-            if any(keyword in text for keyword in deadline_keywords):
+        # Fields are plain strings we already hold, so skip pydantic validation
+        return [
+            Task.model_construct(
+                title=f"Slack: {text[:50]}",
+                description=text,
                 # Extract course name from channel or message
-                channel_name = message.get('channel_id', 'unknown')
-                
-                task = Task(
-                    title=f"Slack: {message.get('text', '')[:50]}",
-                    description=message.get('text', ''),
-                    course=channel_name,
-                    due_date=datetime.now() + timedelta(days=2),  # Placeholder - would parse actual date
-                    priority=TaskPriority.MEDIUM,
-                    source="slack"
-                )
-                tasks.append(task)
-        
-        return tasks
+                course=message.get('channel_id', 'unknown'),
+                due_date=due_date,
+                priority=TaskPriority.MEDIUM,
+                source="slack",
+                created_at=now,
+                updated_at=now
+            )
+            for message in messages
+            # Only messages that mention deadlines
+            if _DEADLINE_RE.search(text := message.get('text', ''))
+        ]
     
     def send_notification(self, channel_id: str, message: str) -> bool:
         """Send a notification message to a Slack channel"""
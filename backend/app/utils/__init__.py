@@ -0,0 +1,13 @@
+from .cache import SharedTTLCache, ttl_cache
+from .dates import SECONDS_PER_DAY, epoch_seconds, parse_iso_local
+from .http import DEFAULT_TIMEOUT, pooled_session
+
+__all__ = [
+    "ttl_cache",
+    "SharedTTLCache",
+    "SECONDS_PER_DAY",
+    "epoch_seconds",
+    "parse_iso_local",
+    "DEFAULT_TIMEOUT",
+    "pooled_session",
+]
@@ -0,0 +1,119 @@
+import asyncio
+import functools
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+def ttl_cache(ttl_seconds: float) -> Callable:
+    """
+    Memoize a method per instance for ttl_seconds.
+    
+    Results are stored on the instance, keyed by the call arguments. For
+    coroutine methods the in-flight task is cached, so concurrent callers
+    share a single call instead of each starting their own.
+    
+    Call `method.cache_clear(instance)` to invalidate an instance's entries.
+    """
+    def decorator(func: Callable) -> Callable:
+        cache_attr = f"_ttl_cache_{func.__name__}"
+        
+        def _entries(instance) -> dict:
+            return instance.__dict__.setdefault(cache_attr, {})
+        
+        def _key(args, kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            try:
+                hash(key)
+            except TypeError:
+                return None  # Unhashable arguments are never cached
+            return key
+        
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(self, *args, **kwargs):
+                key = _key(args, kwargs)
+                if key is None:
+                    return await func(self, *args, **kwargs)
+                
+                entries = _entries(self)
+                entry = entries.get(key)
+                if entry is None or time.monotonic() >= entry[1]:
+                    task = asyncio.ensure_future(func(self, *args, **kwargs))
+                    entry = (task, time.monotonic() + ttl_seconds)
+                    entries[key] = entry
+                
+                task = entry[0]
+                try:
+                    return await asyncio.shield(task)
+                except Exception:
+                    # Don't keep failures around for the whole TTL
+                    if entries.get(key) is entry:
+                        del entries[key]
+                    raise
+        else:
+            @functools.wraps(func)
+            def wrapper(self, *args, **kwargs):
+                key = _key(args, kwargs)
+                if key is None:
+                    return func(self, *args, **kwargs)
+                
+                entries = _entries(self)
+                entry = entries.get(key)
+                if entry is None or time.monotonic() >= entry[1]:
+                    entry = (func(self, *args, **kwargs), time.monotonic() + ttl_seconds)
+                    entries[key] = entry
+                return entry[0]
+        
+        def cache_clear(instance):
+            instance.__dict__.pop(cache_attr, None)
+        
+        wrapper.cache_clear = cache_clear
+        return wrapper
+    
+    return decorator
+
+
+class SharedTTLCache:
+    """
+    Thread-safe process-wide cache with per-entry expiry and LRU eviction.
+    
+    Used for upstream payloads that are identical across users (e.g. the
+    same Slack channel), so only the first user in a TTL window pays for
+    the fetch. Callers must treat cached values as read-only.
+    """
+    
+    def __init__(self, ttl_seconds: float, maxsize: int = 1024):
+        self.ttl_seconds = ttl_seconds
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() >= entry[1]:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+    
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        """Store value; ttl_seconds overrides the cache default for this entry"""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+    
+    def discard(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
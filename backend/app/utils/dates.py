@@ -0,0 +1,26 @@
+from datetime import datetime, timezone
+
+SECONDS_PER_DAY = 86400
+
+
+def epoch_seconds(dt: datetime) -> float:
+    """
+    Seconds since the epoch, treating naive datetimes as wall-clock time so
+    day differences match naive datetime subtraction across DST changes.
+    """
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def parse_iso_local(value: str) -> datetime:
+    """
+    Parse an ISO 8601 string into a naive local datetime, the form every task
+    due date uses. Offset-aware inputs are converted to local time so they
+    compare cleanly with datetime.now().
+    """
+    # fromisoformat only accepts a trailing 'Z' from Python 3.11 on
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is not None:
+        dt = dt.astimezone().replace(tzinfo=None)
+    return dt
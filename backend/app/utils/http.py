@@ -0,0 +1,28 @@
+from typing import Optional
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (connect, read) seconds; requests waits forever without one
+DEFAULT_TIMEOUT = (3.05, 10)
+
+
+def pooled_session(pool_size: int = 10, headers: Optional[dict] = None) -> requests.Session:
+    """
+    A keep-alive session whose connection pool fits pool_size concurrent
+    requests, retrying idempotent calls on rate limits and transient 5xx.
+    """
+    session = requests.Session()
+    if headers:
+        session.headers.update(headers)
+    
+    retry = Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=(429, 500, 502, 503, 504),
+        respect_retry_after_header=True
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
@@ -5,12 +5,37 @@ This demonstrates the autonomous agent functionality
 import asyncio
 import requests
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 # Configuration
 API_BASE_URL = "http://localhost:8000"
 USER_EMAIL = "test@ucsc.edu"
 
+# One keep-alive session per thread instead of a new connection per request
+# (a requests.Session isn't guaranteed to be thread-safe, so threads don't share one)
+_local = threading.local()
+
+def http_session():
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+# (method, path) for each check; main() fetches the GETs concurrently
+ENDPOINTS = {
+    "health": ("GET", "/users/{user_id}/health"),
+    "tasks": ("GET", "/users/{user_id}/tasks"),
+    "weekly_plan": ("POST", "/users/{user_id}/plan/weekly"),
+    "decisions": ("GET", "/users/{user_id}/agent/decisions"),
+    "status": ("GET", "/users/{user_id}/agent/status"),
+    "actions": ("GET", "/users/{user_id}/agent/actions"),
+}
+
+def call_endpoint(name, user_id):
+    method, path = ENDPOINTS[name]
+    return http_session().request(method, API_BASE_URL + path.format(user_id=user_id))
+
 def print_section(title):
     print("\n" + "="*60)
     print(f"  {title}")
@@ -35,7 +60,7 @@ def create_test_user():
         }
     }
     
-    response = requests.post(f"{API_BASE_URL}/users", json=user_data)
+    response = http_session().post(f"{API_BASE_URL}/users", json=user_data)
     if response.status_code == 200:
         user = response.json()
         print(f"✅ User created: {user['email']}")
@@ -46,11 +71,12 @@ def create_test_user():
         print(response.text)
         return None
 
-def test_agent_status(user_id):
+def test_agent_status(user_id, response=None):
     """Test agent status"""
     print_section("Checking Agent Status")
     
-    response = requests.get(f"{API_BASE_URL}/users/{user_id}/agent/status")
+    if response is None:
+        response = call_endpoint("status", user_id)
     if response.status_code == 200:
         status = response.json()
         print(f"✅ Agent Status:")
@@ -63,11 +89,12 @@ def test_agent_status(user_id):
         print(f"❌ Error getting status: {response.status_code}")
         return None
 
-def test_academic_health(user_id):
+def test_academic_health(user_id, response=None):
     """Test academic health check"""
     print_section("Checking Academic Health")
     
-    response = requests.get(f"{API_BASE_URL}/users/{user_id}/health")
+    if response is None:
+        response = call_endpoint("health", user_id)
     if response.status_code == 200:
         health = response.json()
         print(f"✅ Academic Health:")
@@ -84,11 +111,12 @@ def test_academic_health(user_id):
         print(f"❌ Error checking health: {response.status_code}")
         return None
 
-def test_weekly_plan(user_id):
+def test_weekly_plan(user_id, response=None):
     """Test weekly plan creation"""
     print_section("Creating Weekly Plan")
     
-    response = requests.post(f"{API_BASE_URL}/users/{user_id}/plan/weekly")
+    if response is None:
+        response = call_endpoint("weekly_plan", user_id)
     if response.status_code == 200:
         plan = response.json()
         print(f"✅ Weekly Plan Created:")
@@ -106,11 +134,12 @@ def test_weekly_plan(user_id):
         print(response.text)
         return None
 
-def test_autonomous_decisions(user_id):
+def test_autonomous_decisions(user_id, response=None):
     """Test autonomous decision-making"""
     print_section("Viewing Autonomous Decisions")
     
-    response = requests.get(f"{API_BASE_URL}/users/{user_id}/agent/decisions")
+    if response is None:
+        response = call_endpoint("decisions", user_id)
     if response.status_code == 200:
         result = response.json()
         decisions = result.get('decisions', [])
@@ -128,11 +157,12 @@ def test_autonomous_decisions(user_id):
         print(f"❌ Error getting decisions: {response.status_code}")
         return None
 
-def test_agent_actions(user_id):
+def test_agent_actions(user_id, response=None):
     """Test agent action history"""
     print_section("Viewing Agent Action History")
     
-    response = requests.get(f"{API_BASE_URL}/users/{user_id}/agent/actions")
+    if response is None:
+        response = call_endpoint("actions", user_id)
     if response.status_code == 200:
         result = response.json()
         actions = result.get('actions', [])
@@ -157,7 +187,7 @@ def test_manual_cycle(user_id):
     print_section("Manually Triggering Agent Cycle")
     
     print("   Triggering agent cycle...")
-    response = requests.post(f"{API_BASE_URL}/users/{user_id}/agent/execute-cycle")
+    response = http_session().post(f"{API_BASE_URL}/users/{user_id}/agent/execute-cycle")
     if response.status_code == 200:
         result = response.json()
         print(f"✅ Cycle Completed")
@@ -173,11 +203,12 @@ def test_manual_cycle(user_id):
         print(response.text)
         return None
 
-def test_tasks(user_id):
+def test_tasks(user_id, response=None):
     """Test getting all tasks"""
     print_section("Getting All Tasks")
     
-    response = requests.get(f"{API_BASE_URL}/users/{user_id}/tasks")
+    if response is None:
+        response = call_endpoint("tasks", user_id)
     if response.status_code == 200:
         tasks = response.json()
         print(f"✅ Total Tasks: {len(tasks)}")
@@ -200,7 +231,7 @@ async def test_autonomous_loop(user_id, duration_seconds=30):
     
     # Start the agent
     print("   Starting autonomous agent...")
-    response = requests.post(f"{API_BASE_URL}/users/{user_id}/agent/start")
+    response = http_session().post(f"{API_BASE_URL}/users/{user_id}/agent/start")
     if response.status_code != 200:
         print(f"❌ Error starting agent: {response.status_code}")
         return
@@ -216,7 +247,7 @@ async def test_autonomous_loop(user_id, duration_seconds=30):
             actions = test_agent_actions(user_id)
     
     print("\n   Stopping agent...")
-    requests.post(f"{API_BASE_URL}/users/{user_id}/agent/stop")
+    http_session().post(f"{API_BASE_URL}/users/{user_id}/agent/stop")
     print("✅ Agent stopped")
 
 def main():
@@ -227,7 +258,7 @@ def main():
     
     # Check if server is running
     try:
-        response = requests.get(f"{API_BASE_URL}/")
+        response = http_session().get(f"{API_BASE_URL}/")
         print(f"\n✅ Server is running: {response.json()}")
     except:
         print(f"\n❌ Server is not running at {API_BASE_URL}")
@@ -239,13 +270,21 @@ def main():
     if not user_id:
         return
     
-    # Basic tests
-    test_academic_health(user_id)
-    test_tasks(user_id)
+    # Creating the weekly plan rewrites task due dates, so it runs on its own first
     test_weekly_plan(user_id)
-    test_autonomous_decisions(user_id)
-    test_agent_status(user_id)
-    test_agent_actions(user_id)
+    
+    # The rest are read-only - fetch them all at once and print in order
+    checks = [
+        ("health", test_academic_health),
+        ("tasks", test_tasks),
+        ("decisions", test_autonomous_decisions),
+        ("status", test_agent_status),
+        ("actions", test_agent_actions),
+    ]
+    with ThreadPoolExecutor(max_workers=len(checks)) as pool:
+        responses = list(pool.map(lambda check: call_endpoint(check[0], user_id), checks))
+    for (_, test), response in zip(checks, responses):
+        test(user_id, response)
     
     # Test manual cycle
     test_manual_cycle(user_id)